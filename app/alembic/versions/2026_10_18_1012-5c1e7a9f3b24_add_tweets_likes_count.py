@@ -0,0 +1,70 @@
+"""add tweets likes_count
+
+Revision ID: 5c1e7a9f3b24
+Revises: 239a9894de14
+Create Date: 2026-10-18 10:12:41.208316
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a9f3b24"
+down_revision: Union[str, None] = "239a9894de14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Размер пачки твитов при заполнении счетчика: каждая пачка обновляется в своей
+# транзакции, чтобы не держать блокировку строк всей таблицы до конца миграции.
+BACKFILL_BATCH: int = 10_000
+
+
+def upgrade() -> None:
+    # Колонка с постоянным значением по умолчанию добавляется без перезаписи таблицы.
+    op.add_column(
+        "tweets",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Заполнение и CREATE INDEX CONCURRENTLY выполняются вне транзакции миграции.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last_id: int = conn.scalar(
+            sa.text("SELECT coalesce(max(tweet_id), 0) FROM tweets")
+        )
+        # Заполняем счетчик по уже существующим лайкам, пачками по tweet_id.
+        for start in range(1, last_id + 1, BACKFILL_BATCH):
+            conn.execute(
+                sa.text(
+                    """
+                    UPDATE tweets
+                    SET likes_count = counted.likes
+                    FROM (
+                        SELECT tweet_id, count(*) AS likes
+                        FROM likes
+                        WHERE tweet_id >= :start AND tweet_id < :stop
+                        GROUP BY tweet_id
+                    ) AS counted
+                    WHERE tweets.tweet_id = counted.tweet_id
+                    """
+                ),
+                {"start": start, "stop": start + BACKFILL_BATCH},
+            )
+        op.create_index(
+            "ix_tweets_likes_count_tweet_id",
+            "tweets",
+            [sa.text("likes_count DESC"), sa.text("tweet_id DESC")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tweets_likes_count_tweet_id",
+            table_name="tweets",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("tweets", "likes_count")
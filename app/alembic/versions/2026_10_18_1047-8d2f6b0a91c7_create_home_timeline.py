@@ -0,0 +1,71 @@
+"""create home_timeline
+
+Revision ID: 8d2f6b0a91c7
+Revises: 5c1e7a9f3b24
+Create Date: 2026-10-18 10:47:09.553120
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from config import timeline_backfill_limit
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2f6b0a91c7"
+down_revision: Union[str, None] = "5c1e7a9f3b24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "home_timeline",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(
+            ["tweet_id"],
+            ["tweets.tweet_id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    op.create_index(
+        op.f("ix_home_timeline_tweet_id"), "home_timeline", ["tweet_id"], unique=False
+    )
+    op.create_index(
+        "ix_home_timeline_user_id_score_tweet_id",
+        "home_timeline",
+        ["user_id", sa.text("score DESC"), sa.text("tweet_id DESC")],
+        unique=False,
+    )
+    # Раскладываем уже существующие твиты по лентам подписчиков. Как и при новой
+    # подписке, берем только последние timeline_backfill_limit твитов каждого автора,
+    # иначе вставка растет как подписки × твиты.
+    op.execute(
+        sa.text(
+            """
+            INSERT INTO home_timeline (user_id, tweet_id, score)
+            SELECT followers.follower_id, latest.tweet_id, latest.likes_count
+            FROM followers
+            CROSS JOIN LATERAL (
+                SELECT tweets.tweet_id, tweets.likes_count
+                FROM tweets
+                WHERE tweets.user_id = followers.followed_id
+                ORDER BY tweets.tweet_id DESC
+                LIMIT :limit
+            ) AS latest
+            """
+        ).bindparams(limit=timeline_backfill_limit)
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_home_timeline_user_id_score_tweet_id", table_name="home_timeline")
+    op.drop_index(op.f("ix_home_timeline_tweet_id"), table_name="home_timeline")
+    op.drop_table("home_timeline")
@@ -0,0 +1,38 @@
+"""add likes tweet_id user_id index
+
+Revision ID: b74e0c3d5a18
+Revises: 8d2f6b0a91c7
+Create Date: 2026-10-18 11:33:52.719405
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b74e0c3d5a18"
+down_revision: Union[str, None] = "8d2f6b0a91c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу,
+    # но не может выполняться внутри транзакции.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_likes_tweet_id_user_id",
+            "likes",
+            ["tweet_id", "user_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_likes_tweet_id_user_id",
+            table_name="likes",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,38 @@
+"""add followers followed_id follower_id index
+
+Revision ID: e3a9c51f7d62
+Revises: b74e0c3d5a18
+Create Date: 2026-10-18 12:14:06.381572
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a9c51f7d62"
+down_revision: Union[str, None] = "b74e0c3d5a18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу,
+    # но не может выполняться внутри транзакции.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_followers_followed_id_follower_id",
+            "followers",
+            ["followed_id", "follower_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_followers_followed_id_follower_id",
+            table_name="followers",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,58 @@
+"""add users counters
+
+Revision ID: 4f6b2d8e0a35
+Revises: e3a9c51f7d62
+Create Date: 2026-10-18 13:09:27.654113
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4f6b2d8e0a35"
+down_revision: Union[str, None] = "e3a9c51f7d62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ("followers_count", "following_count", "tweets_count")
+
+
+def upgrade() -> None:
+    for name in COUNTERS:
+        op.add_column(
+            "users",
+            sa.Column(name, sa.Integer(), server_default="0", nullable=False),
+        )
+    # Заполняем счетчики по уже существующим подпискам и твитам.
+    op.execute(
+        """
+        UPDATE users
+        SET followers_count = coalesce(f.total, 0),
+            following_count = coalesce(g.total, 0),
+            tweets_count = coalesce(t.total, 0)
+        FROM users AS u
+        LEFT JOIN (
+            SELECT followed_id AS user_id, count(*) AS total
+            FROM followers
+            GROUP BY followed_id
+        ) AS f ON f.user_id = u.id
+        LEFT JOIN (
+            SELECT follower_id AS user_id, count(*) AS total
+            FROM followers
+            GROUP BY follower_id
+        ) AS g ON g.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id, count(*) AS total
+            FROM tweets
+            GROUP BY user_id
+        ) AS t ON t.user_id = u.id
+        WHERE users.id = u.id
+        """
+    )
+
+
+def downgrade() -> None:
+    for name in reversed(COUNTERS):
+        op.drop_column("users", name)
@@ -0,0 +1,88 @@
+"""restructure indexes
+
+Revision ID: 9c2e5a7d1b46
+Revises: 4f6b2d8e0a35
+Create Date: 2026-10-18 14:22:41.208537
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2e5a7d1b46"
+down_revision: Union[str, None] = "4f6b2d8e0a35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы, которые повторяют первичный ключ или его ведущую колонку, либо ведущую
+# колонку составного индекса: (имя, таблица, колонка).
+REDUNDANT_INDEXES = (
+    ("ix_users_id", "users", "id"),
+    ("ix_tweets_tweet_id", "tweets", "tweet_id"),
+    ("ix_images_id", "images", "id"),
+    ("ix_likes_user_id", "likes", "user_id"),
+    ("ix_likes_tweet_id", "likes", "tweet_id"),
+    ("ix_followers_follower_id", "followers", "follower_id"),
+    ("ix_followers_followed_id", "followers", "followed_id"),
+    ("ix_tweets_user_id", "tweets", "user_id"),
+)
+
+
+def upgrade() -> None:
+    # CREATE/DROP INDEX CONCURRENTLY не блокируют запись в таблицу,
+    # но не могут выполняться внутри транзакции.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tweets_user_id_tweet_id",
+            "tweets",
+            ["user_id", sa.text("tweet_id DESC")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_users_api_key",
+            "users",
+            ["api_key"],
+            unique=True,
+            postgresql_include=["id", "name"],
+            postgresql_concurrently=True,
+        )
+        # Уникальность api_key теперь проверяет покрывающий индекс.
+        op.drop_constraint("users_api_key_key", "users", type_="unique")
+        for name, table, _ in REDUNDANT_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, column in reversed(REDUNDANT_INDEXES):
+            op.create_index(
+                name,
+                table,
+                [column],
+                unique=False,
+                postgresql_concurrently=True,
+            )
+        op.create_index(
+            "users_api_key_key",
+            "users",
+            ["api_key"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.execute(
+            "ALTER TABLE users ADD CONSTRAINT users_api_key_key "
+            "UNIQUE USING INDEX users_api_key_key"
+        )
+        op.drop_index(
+            "ix_users_api_key",
+            table_name="users",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_tweets_user_id_tweet_id",
+            table_name="tweets",
+            postgresql_concurrently=True,
+        )
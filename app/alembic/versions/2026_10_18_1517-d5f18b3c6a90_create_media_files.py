@@ -0,0 +1,43 @@
+"""create media files
+
+Revision ID: d5f18b3c6a90
+Revises: 9c2e5a7d1b46
+Create Date: 2026-10-18 15:17:03.846219
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5f18b3c6a90"
+down_revision: Union[str, None] = "9c2e5a7d1b46"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "media_files",
+        sa.Column("key", sa.String(length=200), nullable=False),
+        sa.Column("refcount", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    # Уже загруженные картинки лежат в хранилище под прежними именами, считаем
+    # ссылки на них из твитов и еще не привязанных к твитам загрузок.
+    op.execute(
+        """
+        INSERT INTO media_files (key, refcount)
+        SELECT name, count(*) FROM (
+            SELECT unnest(tweet_media_ids) AS name FROM tweets
+            UNION ALL
+            SELECT url FROM images
+        ) AS refs
+        GROUP BY name
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("media_files")
@@ -0,0 +1,52 @@
+"""drop home timeline score
+
+Revision ID: 7a3c9e1f5b82
+Revises: d5f18b3c6a90
+Create Date: 2026-10-18 16:04:27.519834
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3c9e1f5b82"
+down_revision: Union[str, None] = "d5f18b3c6a90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Лента подписок читается по первичному ключу (user_id, tweet_id), поэтому
+    # лайку больше не нужно переписывать строку в ленте каждого подписчика автора.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_home_timeline_user_id_score_tweet_id",
+            table_name="home_timeline",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("home_timeline", "score")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "home_timeline",
+        sa.Column("score", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE home_timeline
+        SET score = tweets.likes_count
+        FROM tweets
+        WHERE tweets.tweet_id = home_timeline.tweet_id
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_home_timeline_user_id_score_tweet_id",
+            "home_timeline",
+            ["user_id", sa.text("score DESC"), sa.text("tweet_id DESC")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,96 @@
+"""
+Benchmark of posting a tweet depending on the size of the author's account.
+
+The current add_tweet_in_db is compared with the previous implementation,
+which loaded the author with all followers, followings and tweets.
+
+Run from the app directory (Docker is required for the test container):
+
+    python -m benchmarks.bench_add_tweet --sizes 0 1000 10000 --repeat 200
+"""
+import argparse
+import asyncio
+from typing import List
+
+from benchmarks.common import (
+    benchmark_database,
+    measure,
+    report,
+    reset_schema,
+    seed_author,
+    summarize,
+)
+from cache import UserIdentity
+from crud.tweet import add_tweet_in_db
+from models.model import Tweet, User
+from schemas.tweet_schema import AddTweetSchema
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+TWEET = AddTweetSchema(tweet_data="Benchmark tweet", tweet_media_ids=[])
+
+
+async def legacy_add_tweet(session: AsyncSession, author_id: int) -> int:
+    """Прежний способ сохранения: загрузка полного профиля автора и всех его твитов."""
+    stmt = (
+        select(User)
+        .options(joinedload(User.followed))
+        .options(joinedload(User.follower))
+        .options(joinedload(User.tweets))
+        .filter(User.id == author_id)
+    )
+    author: User | None = (await session.scalars(stmt)).unique().one_or_none()
+    tweet = Tweet(tweet_data=TWEET.tweet_data, tweet_media_ids=[])
+    if author is not None:
+        author.tweets.append(tweet)
+        session.add_all(author.tweets)
+    await session.commit()
+    return tweet.tweet_id
+
+
+async def run(sizes: List[int], repeat: int, legacy_repeat: int) -> dict:
+    results: dict = {"benchmark": "add_tweet", "repeat": repeat, "sizes": {}}
+    async with benchmark_database() as (engine, session_maker):
+        for size in sizes:
+            await reset_schema(engine)
+            author_id: int = await seed_author(session_maker, size, size)
+            author = UserIdentity(id=author_id, name="Author")
+
+            async def current() -> None:
+                async with session_maker() as session:
+                    await add_tweet_in_db(session, author, TWEET)
+
+            async def legacy() -> None:
+                async with session_maker() as session:
+                    await legacy_add_tweet(session, author_id)
+
+            results["sizes"][str(size)] = {
+                "followers": size,
+                "tweets": size,
+                "insert_returning": summarize(await measure(current, repeat)),
+                "legacy_full_profile": summarize(
+                    await measure(legacy, legacy_repeat, warmup=1)
+                ),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[0, 1_000, 10_000],
+        help="Number of followers and tweets of the author",
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--legacy-repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args.sizes, args.repeat, args.legacy_repeat)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark of the feed and profile reads: ORM entities against Core selects.
+
+The ORM path is the previous implementation: full Tweet instances with the
+joined author de-duplicated by unique(), and the profile loaded with
+session.get(User). The Core path is the current tweet_constructor and
+get_user_profile, which select only the needed columns into __slots__ records.
+For every path the p50/p95/p99 latency and the peak memory allocated per
+request are reported.
+
+Run from the app directory (Docker is required for the test container):
+
+    python -m benchmarks.bench_feed_reads --tweets 10000 --limit 100 --repeat 200
+"""
+import argparse
+import asyncio
+
+import orjson
+
+from benchmarks.common import (
+    benchmark_database,
+    measure,
+    measure_allocations,
+    report,
+    seed_author,
+    summarize,
+)
+from crud.tweet import get_likes_sample
+from crud.user import get_user_profile
+from models.model import Tweet, User
+from service import get_user_info, tweet_constructor
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
+
+
+async def seed_likes(
+    session_maker: async_sessionmaker[AsyncSession],
+    author_id: int,
+    likes_per_tweet: int,
+) -> None:
+    """Каждый твит лайкают первые likes_per_tweet подписчиков автора."""
+    async with session_maker() as session:
+        await session.execute(
+            text(
+                "INSERT INTO likes (user_id, tweet_id) "
+                "SELECT likers.id, tweets.tweet_id FROM tweets "
+                "JOIN LATERAL (SELECT id FROM users WHERE id <> :author "
+                "ORDER BY id LIMIT :count) AS likers ON true"
+            ),
+            {"author": author_id, "count": likes_per_tweet},
+        )
+        await session.execute(
+            text(
+                "UPDATE tweets SET likes_count = ("
+                "SELECT count(*) FROM likes WHERE likes.tweet_id = tweets.tweet_id)"
+            )
+        )
+        await session.execute(
+            text(
+                "UPDATE users SET tweets_count = :count, followers_count = :followers "
+                "WHERE id = :author"
+            ),
+            {
+                "author": author_id,
+                "count": await session.scalar(text("SELECT count(*) FROM tweets")),
+                "followers": await session.scalar(text("SELECT count(*) FROM followers")),
+            },
+        )
+        await session.commit()
+
+
+async def orm_feed(session: AsyncSession, limit: int) -> bytes:
+    """Прежний способ: объекты Tweet с автором через joinedload и unique()."""
+    stmt = (
+        select(Tweet)
+        .options(joinedload(Tweet.user))
+        .order_by(Tweet.likes_count.desc(), Tweet.tweet_id.desc())
+        .limit(limit + 1)
+    )
+    tweets = (await session.scalars(stmt)).unique().all()[:limit]
+    likes_sample = await get_likes_sample(session, [tweet.tweet_id for tweet in tweets])
+    return orjson.dumps(
+        {
+            "result": True,
+            "tweets": [
+                {
+                    "id": tweet.tweet_id,
+                    "content": tweet.tweet_data,
+                    "attachments": tweet.tweet_media_ids,
+                    "author": {"id": tweet.user.id, "name": tweet.user.name},
+                    "likes": likes_sample.get(tweet.tweet_id, []),
+                    "likes_count": tweet.likes_count,
+                    "liked_by_me": False,
+                }
+                for tweet in tweets
+            ],
+        }
+    )
+
+
+async def orm_profile(session: AsyncSession, user_id: int) -> bytes:
+    """Прежний способ: пользователь загружается целиком через session.get."""
+    user: User | None = await session.get(User, user_id)
+    if user is None:
+        raise LookupError("User {0} is not seeded".format(user_id))
+    return orjson.dumps(
+        {
+            "id": user.id,
+            "name": user.name,
+            "followers_count": user.followers_count,
+            "following_count": user.following_count,
+            "tweets_count": user.tweets_count,
+        }
+    )
+
+
+async def run(tweets: int, followers: int, likes: int, limit: int, repeat: int) -> dict:
+    results: dict = {
+        "benchmark": "feed_reads",
+        "tweets": tweets,
+        "likes_per_tweet": likes,
+        "limit": limit,
+        "repeat": repeat,
+    }
+    async with benchmark_database() as (engine, session_maker):
+        author_id: int = await seed_author(session_maker, followers, tweets)
+        await seed_likes(session_maker, author_id, likes)
+
+        async def feed_orm() -> None:
+            async with session_maker() as session:
+                await orm_feed(session, limit)
+
+        async def feed_core() -> None:
+            async with session_maker() as session:
+                orjson.dumps(await tweet_constructor(session, author_id, None, limit))
+
+        async def profile_orm() -> None:
+            async with session_maker() as session:
+                await orm_profile(session, author_id)
+
+        async def profile_core() -> None:
+            async with session_maker() as session:
+                profile = await get_user_profile(session, author_id)
+                orjson.dumps(await get_user_info(session, profile))
+
+        for name, func in (
+            ("feed_orm", feed_orm),
+            ("feed_core", feed_core),
+            ("profile_orm", profile_orm),
+            ("profile_core", profile_core),
+        ):
+            results[name] = {
+                "latency": summarize(await measure(func, repeat)),
+                "allocations": await measure_allocations(func, repeat),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tweets", type=int, default=10_000)
+    parser.add_argument("--followers", type=int, default=100)
+    parser.add_argument("--likes", type=int, default=3, help="Likes of every tweet")
+    parser.add_argument("--limit", type=int, default=100, help="Tweets per page")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+    report(
+        asyncio.run(
+            run(args.tweets, args.followers, args.likes, args.limit, args.repeat)
+        ),
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Benchmark of the index layout: before and after migration 9c2e5a7d1b46.
+
+The database is seeded at the requested scale, then the hot lookups of the
+application are run under EXPLAIN (ANALYZE, BUFFERS) with the previous set of
+indexes and with the current one. For every query the median execution time,
+the buffers touched and the indexes used are reported, together with the size
+of the indexes of every table and the time of inserting a batch of likes and
+follows, which pays for every index of the table.
+
+Run from the app directory (Docker is required for the test container):
+
+    python -m benchmarks.bench_indexes --users 10000 --tweets 1000000 \\
+        --likes 10000000 --follows 100000 --repeat 20 --output indexes.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from typing import Dict, List
+
+from benchmarks.common import benchmark_database, measure, report, seed_scale, summarize
+from config import number_of_follows, number_of_likes, timeline_backfill_limit
+from models.model import Tweet, User, followers, likes_table
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+# Переход от текущих индексов к индексам до миграции и обратно.
+LEGACY_INDEXES: List[str] = [
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE INDEX ix_tweets_tweet_id ON tweets (tweet_id)",
+    "CREATE INDEX ix_images_id ON images (id)",
+    "CREATE INDEX ix_likes_user_id ON likes (user_id)",
+    "CREATE INDEX ix_likes_tweet_id ON likes (tweet_id)",
+    "CREATE INDEX ix_followers_follower_id ON followers (follower_id)",
+    "CREATE INDEX ix_followers_followed_id ON followers (followed_id)",
+    "CREATE INDEX ix_tweets_user_id ON tweets (user_id)",
+    "ALTER TABLE users ADD CONSTRAINT users_api_key_key UNIQUE (api_key)",
+    "DROP INDEX ix_users_api_key",
+    "DROP INDEX ix_tweets_user_id_tweet_id",
+]
+CURRENT_INDEXES: List[str] = [
+    "CREATE INDEX ix_tweets_user_id_tweet_id ON tweets (user_id, tweet_id DESC)",
+    "CREATE UNIQUE INDEX ix_users_api_key ON users (api_key) INCLUDE (id, name)",
+    "ALTER TABLE users DROP CONSTRAINT users_api_key_key",
+    "DROP INDEX ix_users_id",
+    "DROP INDEX ix_tweets_tweet_id",
+    "DROP INDEX ix_images_id",
+    "DROP INDEX ix_likes_user_id",
+    "DROP INDEX ix_likes_tweet_id",
+    "DROP INDEX ix_followers_follower_id",
+    "DROP INDEX ix_followers_followed_id",
+    "DROP INDEX ix_tweets_user_id",
+]
+
+
+def hot_queries(user_id: int, tweet_id: int) -> Dict[str, Select]:
+    """
+    Запросы приложения, для которых подбирались индексы.
+
+    :param user_id: Пользователь, для которого выполняются запросы.
+    :param tweet_id: Твит, для которого выполняются запросы.
+    :return Dict: Имя запроса -> выражение.
+    """
+    page: List[int] = list(range(tweet_id, tweet_id + 10))
+    return {
+        "auth_by_api_key": select(User.id, User.name).where(
+            User.api_key == "load-{0}".format(user_id)
+        ),
+        "author_recent_tweets": select(Tweet.tweet_id, Tweet.likes_count)
+        .where(Tweet.user_id == user_id)
+        .order_by(Tweet.tweet_id.desc())
+        .limit(timeline_backfill_limit),
+        "author_tweets_count": select(func.count())
+        .select_from(Tweet)
+        .where(Tweet.user_id == user_id),
+        "followers_page": select(followers.c.follower_id)
+        .where(followers.c.followed_id == user_id)
+        .order_by(followers.c.follower_id)
+        .limit(number_of_follows + 1),
+        "following_page": select(followers.c.followed_id)
+        .where(followers.c.follower_id == user_id)
+        .order_by(followers.c.followed_id)
+        .limit(number_of_follows + 1),
+        "likes_page": select(likes_table.c.user_id)
+        .where(likes_table.c.tweet_id == tweet_id)
+        .order_by(likes_table.c.user_id)
+        .limit(number_of_likes + 1),
+        "liked_by_me": select(likes_table.c.tweet_id).where(
+            likes_table.c.user_id == user_id,
+            likes_table.c.tweet_id.in_(page),
+        ),
+    }
+
+
+def plan_summary(plan: dict) -> dict:
+    """
+    Из плана EXPLAIN в формате JSON берем узлы, индексы и прочитанные буферы.
+
+    :param plan: Корневой элемент ответа EXPLAIN (FORMAT JSON).
+    :return dict: Время, буферы, типы узлов и использованные индексы.
+    """
+    nodes: List[str] = []
+    indexes: List[str] = []
+
+    def walk(node: dict) -> None:
+        nodes.append(node["Node Type"])
+        if "Index Name" in node:
+            indexes.append(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    return {
+        "execution_ms": plan["Execution Time"],
+        "shared_hit_blocks": plan["Plan"].get("Shared Hit Blocks", 0),
+        "shared_read_blocks": plan["Plan"].get("Shared Read Blocks", 0),
+        "nodes": nodes,
+        "indexes": indexes,
+    }
+
+
+async def explain_queries(
+    session_maker: async_sessionmaker[AsyncSession],
+    queries: Dict[str, Select],
+    repeat: int,
+) -> Dict[str, dict]:
+    """
+    Выполняем каждый запрос под EXPLAIN (ANALYZE, BUFFERS) repeat раз.
+
+    :param session_maker: Фабрика сессий.
+    :param queries: Имя запроса -> выражение.
+    :param repeat: Количество выполнений, в отчет идет медиана времени.
+    :return Dict: Итоги по каждому запросу, план берется из последнего выполнения.
+    """
+    results: Dict[str, dict] = {}
+    async with session_maker() as session:
+        for name, stmt in queries.items():
+            sql: str = str(
+                stmt.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={"literal_binds": True},
+                )
+            )
+            timings: List[float] = []
+            for _ in range(repeat):
+                raw = await session.scalar(
+                    text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+                )
+                # Без объявленного типа колонки драйвер отдает план строкой.
+                plan: list = json.loads(raw) if isinstance(raw, str) else raw
+                summary: dict = plan_summary(plan[0])
+                timings.append(summary["execution_ms"])
+            summary["execution_ms"] = round(statistics.median(timings), 3)
+            results[name] = summary
+    return results
+
+
+async def index_sizes(session_maker: async_sessionmaker[AsyncSession]) -> Dict[str, int]:
+    """Суммарный размер индексов каждой таблицы в KiB."""
+    async with session_maker() as session:
+        rows = await session.execute(
+            text(
+                "SELECT relname, sum(pg_relation_size(indexrelid)) / 1024 AS kib "
+                "FROM pg_stat_user_indexes GROUP BY relname ORDER BY relname"
+            )
+        )
+        return {row.relname: int(row.kib) for row in rows}
+
+
+async def apply(engine: AsyncEngine, statements: List[str]) -> None:
+    """Меняем набор индексов и обновляем статистику и карту видимости."""
+    async with engine.begin() as conn:
+        for statement in statements:
+            await conn.execute(text(statement))
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+
+
+async def run_layout(
+    session_maker: async_sessionmaker[AsyncSession],
+    args: argparse.Namespace,
+) -> dict:
+    """Замеры для текущего набора индексов."""
+    user_id: int = args.users // 2
+    tweet_id: int = args.tweets // 2
+
+    async def insert_batch() -> None:
+        # Пачка новых лайков и подписок, откатывается после вставки.
+        async with session_maker() as session:
+            await session.execute(
+                text(
+                    "INSERT INTO likes (user_id, tweet_id) "
+                    "SELECT :user, g FROM generate_series(1, :count) AS g "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"user": user_id, "count": min(args.batch, args.tweets)},
+            )
+            await session.execute(
+                text(
+                    "INSERT INTO followers (follower_id, followed_id) "
+                    "SELECT :user, g FROM generate_series(1, :count) AS g "
+                    "WHERE g <> :user ON CONFLICT DO NOTHING"
+                ),
+                {"user": user_id, "count": min(args.batch, args.users)},
+            )
+            await session.rollback()
+
+    return {
+        "queries": await explain_queries(
+            session_maker, hot_queries(user_id, tweet_id), args.repeat
+        ),
+        "index_size_kib": await index_sizes(session_maker),
+        "insert_batch": summarize(await measure(insert_batch, args.repeat, warmup=1)),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results: dict = {
+        "benchmark": "indexes",
+        "scale": {
+            "users": args.users,
+            "tweets": args.tweets,
+            "likes": args.likes,
+            "follows": args.follows,
+        },
+        "repeat": args.repeat,
+        "batch": args.batch,
+    }
+    async with benchmark_database() as (engine, session_maker):
+        await seed_scale(session_maker, args.users, args.tweets, args.likes, args.follows)
+        await apply(engine, LEGACY_INDEXES)
+        results["before"] = await run_layout(session_maker, args)
+        await apply(engine, CURRENT_INDEXES)
+        results["after"] = await run_layout(session_maker, args)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tweets", type=int, default=1_000_000)
+    parser.add_argument("--likes", type=int, default=10_000_000)
+    parser.add_argument("--follows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=1_000, help="Rows per insert")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
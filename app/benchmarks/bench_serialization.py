@@ -0,0 +1,109 @@
+"""
+Benchmark of serializing a feed page.
+
+Three ways of turning a page of tweets into the response body are compared:
+
+* fastapi_default - a dict with ORM authors, validated by the response model
+  with from_attributes and encoded with the stdlib json, as FastAPI does
+  for a route that returns a dict;
+* pydantic_json - the same validation, encoded by pydantic-core;
+* orjson_plain - plain dicts built from rows and encoded with orjson,
+  the path used by get_feed.
+
+The database is not needed, the page is generated in memory.
+
+    python -m benchmarks.bench_serialization --tweets 100 --likes 3 50 --repeat 500
+"""
+import argparse
+import asyncio
+import json
+from typing import List
+
+import orjson
+
+from benchmarks.common import measure, report, summarize
+from models.model import User
+from schemas.tweet_schema import ListTweetSchema
+
+
+def build_page(tweets: int, likes: int, orm_authors: bool) -> dict:
+    """
+    Собираем страницу ленты в том виде, в котором ее формирует tweet_constructor.
+
+    :param tweets: Количество твитов на странице.
+    :param likes: Количество лайкнувших у каждого твита.
+    :param orm_authors: Авторы в виде объектов User, а не словарей.
+    :return dict: Страница ленты.
+    """
+    tweet_list: List[dict] = []
+    for number in range(1, tweets + 1):
+        name: str = "Пользователь {0}".format(number)
+        author = User(id=number, name=name) if orm_authors else {"id": number, "name": name}
+        tweet_list.append(
+            {
+                "id": number,
+                "content": "Текст твита номер {0} ".format(number) * 5,
+                "attachments": ["{0}.png".format(number)],
+                "author": author,
+                "likes": [
+                    {"user_id": user_id, "name": "Лайк {0}".format(user_id)}
+                    for user_id in range(likes)
+                ],
+                "likes_count": likes,
+                "liked_by_me": False,
+            }
+        )
+    return {"result": True, "tweets": tweet_list, "next_cursor": "MTo0Mg"}
+
+
+async def run(tweets: int, likes_sizes: List[int], repeat: int) -> dict:
+    results: dict = {
+        "benchmark": "serialization",
+        "tweets": tweets,
+        "repeat": repeat,
+        "likes": {},
+    }
+    for likes in likes_sizes:
+        orm_page: dict = build_page(tweets, likes, orm_authors=True)
+        plain_page: dict = build_page(tweets, likes, orm_authors=False)
+
+        async def fastapi_default() -> bytes:
+            model = ListTweetSchema.model_validate(orm_page)
+            return json.dumps(model.model_dump(mode="json"), ensure_ascii=False).encode()
+
+        async def pydantic_json() -> bytes:
+            return ListTweetSchema.model_validate(orm_page).model_dump_json().encode()
+
+        async def orjson_plain() -> bytes:
+            return orjson.dumps(plain_page)
+
+        # Все способы должны давать одинаковый по содержанию ответ.
+        assert orjson.loads(await orjson_plain()) == json.loads(await fastapi_default())
+
+        results["likes"][str(likes)] = {
+            "body_bytes": len(await orjson_plain()),
+            "fastapi_default": summarize(await measure(fastapi_default, repeat)),
+            "pydantic_json": summarize(await measure(pydantic_json, repeat)),
+            "orjson_plain": summarize(await measure(orjson_plain, repeat)),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tweets", type=int, default=100, help="Tweets per page")
+    parser.add_argument(
+        "--likes",
+        type=int,
+        nargs="+",
+        default=[3, 50],
+        help="Number of likers embedded in each tweet",
+    )
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args.tweets, args.likes, args.repeat)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Shared setup for benchmarks: a Postgres test container, like in tests/conftest.py,
+and helpers for timing and reporting."""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from config import timeline_backfill_limit
+from crud.counters import reconcile_user_counters
+from models.db_conf import Base
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from testcontainers.postgres import PostgresContainer
+
+
+@asynccontextmanager
+async def benchmark_database() -> AsyncIterator[
+    Tuple[AsyncEngine, async_sessionmaker[AsyncSession]]
+]:
+    """
+    Поднимаем Postgres в контейнере и создаем в нем таблицы приложения.
+
+    :return Tuple: Движок и фабрика сессий для работы с тестовой бд.
+    """
+    postgres_container = PostgresContainer()
+    postgres_container.start()
+    postgres_container.driver = "asyncpg"
+    engine = create_async_engine(postgres_container.get_connection_url())
+    session_maker = async_sessionmaker(
+        bind=engine,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    try:
+        await reset_schema(engine)
+        yield engine, session_maker
+    finally:
+        await engine.dispose()
+        postgres_container.stop()
+
+
+async def reset_schema(engine: AsyncEngine) -> None:
+    """Пересоздаем все таблицы, чтобы замеры не влияли друг на друга."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_author(
+    session_maker: async_sessionmaker[AsyncSession],
+    followers_count: int,
+    tweets_count: int,
+) -> int:
+    """
+    Создаем автора с заданным количеством подписчиков и твитов.
+
+    :param session_maker: Фабрика сессий.
+    :param followers_count: Количество подписчиков автора.
+    :param tweets_count: Количество твитов автора.
+    :return int: ID автора.
+    """
+    async with session_maker() as session:
+        author_id: int = (
+            await session.execute(
+                text(
+                    "INSERT INTO users (api_key, name) "
+                    "VALUES ('bench-author', 'Author') RETURNING id"
+                )
+            )
+        ).scalar_one()
+        await session.execute(
+            text(
+                "INSERT INTO users (api_key, name) "
+                "SELECT 'bench-follower-' || g, 'Follower ' || g "
+                "FROM generate_series(1, :count) AS g"
+            ),
+            {"count": followers_count},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO followers (follower_id, followed_id) "
+                "SELECT id, :author FROM users WHERE id <> :author"
+            ),
+            {"author": author_id},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO tweets (tweet_data, tweet_media_ids, user_id) "
+                "SELECT 'Tweet number ' || g, '{}', :author "
+                "FROM generate_series(1, :count) AS g"
+            ),
+            {"author": author_id, "count": tweets_count},
+        )
+        await session.commit()
+    return author_id
+
+
+async def seed_scale(
+    session_maker: async_sessionmaker[AsyncSession],
+    users: int,
+    tweets: int,
+    likes: int,
+    follows: int,
+) -> None:
+    """
+    Заполняем бд генерацией строк на стороне Postgres. Твиты распределены
+    по авторам по кругу, пары (пользователь, твит) для лайков и (подписчик, автор)
+    для подписок не повторяются. Ленты подписчиков заполняются, как при подписке,
+    последними timeline_backfill_limit твитами каждого автора.
+
+    :param session_maker: Фабрика сессий.
+    :param users: Количество пользователей, их api_key - load-1 ... load-N.
+    :param tweets: Количество твитов.
+    :param likes: Количество лайков, не больше users * tweets.
+    :param follows: Количество подписок, не больше users * (users - 1).
+    :return None: Ничего не возвращаем.
+    """
+    likes = min(likes, users * tweets)
+    follows = min(follows, users * (users - 1))
+    statements: List[Tuple[str, Dict[str, int]]] = [
+        (
+            "INSERT INTO users (api_key, name) "
+            "SELECT 'load-' || g, 'User ' || g FROM generate_series(1, :users) AS g",
+            {"users": users},
+        ),
+        (
+            "INSERT INTO tweets (tweet_data, tweet_media_ids, user_id) "
+            "SELECT 'Load test tweet number ' || g, '{}', g % :users + 1 "
+            "FROM generate_series(0, :tweets - 1) AS g",
+            {"users": users, "tweets": tweets},
+        ),
+        (
+            "INSERT INTO likes (user_id, tweet_id) "
+            "SELECT g % :users + 1, g / :users + 1 "
+            "FROM generate_series(0, :likes - 1) AS g",
+            {"users": users, "likes": likes},
+        ),
+        (
+            "INSERT INTO followers (follower_id, followed_id) "
+            "SELECT g % :users + 1, (g % :users + g / :users + 1) % :users + 1 "
+            "FROM generate_series(0, :follows - 1) AS g",
+            {"users": users, "follows": follows},
+        ),
+        (
+            "INSERT INTO home_timeline (user_id, tweet_id) "
+            "SELECT followers.follower_id, latest.tweet_id FROM followers "
+            "CROSS JOIN LATERAL (SELECT tweet_id FROM tweets "
+            "WHERE tweets.user_id = followers.followed_id "
+            "ORDER BY tweet_id DESC LIMIT :limit) AS latest",
+            {"limit": timeline_backfill_limit},
+        ),
+        (
+            "UPDATE tweets SET likes_count = counted.total FROM ("
+            "SELECT tweet_id, count(*) AS total FROM likes GROUP BY tweet_id"
+            ") AS counted WHERE tweets.tweet_id = counted.tweet_id",
+            {},
+        ),
+    ]
+    async with session_maker() as session:
+        for statement, params in statements:
+            await session.execute(text(statement), params)
+        await session.commit()
+        await reconcile_user_counters(session)
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+
+
+async def measure(
+    func: Callable[[], Awaitable[object]],
+    repeat: int,
+    warmup: int = 5,
+) -> List[float]:
+    """
+    Замеряем время выполнения корутины.
+
+    :param func: Функция, возвращающая корутину для замера.
+    :param repeat: Количество замеров.
+    :param warmup: Количество прогревочных вызовов, которые не попадают в результат.
+    :return List[float]: Время каждого вызова в миллисекундах.
+    """
+    for _ in range(warmup):
+        await func()
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def measure_allocations(
+    func: Callable[[], Awaitable[object]],
+    repeat: int,
+) -> Dict[str, float]:
+    """
+    Замеряем пиковый объем памяти, выделяемой за один вызов корутины.
+    Замер идет отдельно от замера времени, так как tracemalloc замедляет выполнение.
+
+    :param func: Функция, возвращающая корутину для замера.
+    :param repeat: Количество замеров.
+    :return Dict: Средний и максимальный пик выделенной памяти в KiB.
+    """
+    await func()
+    peaks: List[float] = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            await func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - current) / 1024)
+    finally:
+        tracemalloc.stop()
+    return {
+        "mean_peak_kib": round(statistics.fmean(peaks), 1),
+        "max_peak_kib": round(max(peaks), 1),
+    }
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Считаем перцентили по замерам.
+
+    :param timings: Время вызовов в миллисекундах.
+    :return Dict: Количество замеров, среднее, p50, p95 и p99.
+    """
+    ordered = sorted(timings)
+
+    def percentile(value: float) -> float:
+        index = min(len(ordered) - 1, round(value / 100 * (len(ordered) - 1)))
+        return round(ordered[index], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+def report(results: dict, output: str | None) -> None:
+    """
+    Выводим результаты в JSON, в файл или в stdout.
+
+    :param results: Результаты замеров.
+    :param output: Путь к файлу, если не указан - печатаем в stdout.
+    :return None: Ничего не возвращаем.
+    """
+    data: str = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as file_object:
+            file_object.write(data)
+    else:
+        print(data)
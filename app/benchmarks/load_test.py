@@ -0,0 +1,262 @@
+"""
+End-to-end load test of the API.
+
+A Postgres test container (the same setup as tests/conftest.py) is seeded at the
+requested scale, then concurrent httpx clients drive the application in-process
+through ASGI with a weighted mix of requests: the feed, profiles, posting tweets,
+uploading images, likes and follows. Throughput and p50/p95/p99 latency of every
+endpoint are written as JSON, so runs can be compared with each other.
+
+Run from the app directory (Docker is required for the test container):
+
+    python -m benchmarks.load_test --users 10000 --tweets 1000000 \\
+        --likes 10000000 --follows 100000 --clients 1000 --duration 60 \\
+        --output load.json
+
+The same scenario can be run against a deployed server with already seeded
+users load-1 ... load-N (the container is not started in this case):
+
+    python -m benchmarks.load_test --base-url http://127.0.0.1 --users 10000 \\
+        --tweets 1000000 --clients 200 --duration 60
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List
+
+import httpx
+
+import crud.utils
+import service
+from benchmarks.common import benchmark_database, report, seed_scale, summarize
+from cache import auth_cache, feed_cache
+from main import app
+from models.db_conf import get_async_session, get_read_session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+IMAGE: bytes = (
+    Path(__file__).parent.parent / "tests/files_for_tests/1629370050_m6.jpg"
+).read_bytes()
+
+
+class Recorder:
+    """Collects latency and status codes of requests by endpoint."""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(
+        self,
+        endpoint: str,
+        request: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response | None:
+        """
+        Выполняем запрос и записываем время ответа и код статуса.
+
+        :param endpoint: Имя эндпоинта в отчете.
+        :param request: Функция, возвращающая корутину запроса.
+        :return Response | None: Ответ или None при ошибке соединения.
+        """
+        start = time.perf_counter()
+        try:
+            response = await request()
+        except httpx.HTTPError:
+            self.statuses[endpoint]["error"] += 1
+            return None
+        self.timings[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][str(response.status_code)] += 1
+        return response
+
+    def results(self, elapsed: float) -> Dict[str, dict]:
+        """
+        Итоги по эндпоинтам: пропускная способность, перцентили и коды ответов.
+
+        :param elapsed: Длительность нагрузки в секундах.
+        :return Dict: Результаты по каждому эндпоинту.
+        """
+        return {
+            endpoint: {
+                "throughput_rps": round(len(timings) / elapsed, 1),
+                "latency": summarize(timings),
+                "statuses": dict(self.statuses[endpoint]),
+            }
+            for endpoint, timings in sorted(self.timings.items())
+        }
+
+
+async def run_client(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    users: int,
+    tweets: int,
+    deadline: float,
+    seed_value: int,
+) -> None:
+    """
+    Один клиент: пользователь со случайным api_key, который до конца нагрузки
+    выполняет случайные запросы с заданными весами.
+    """
+    rnd = random.Random(seed_value)
+    headers = {"api-key": "load-{0}".format(rnd.randint(1, users))}
+
+    async def feed() -> None:
+        response = await recorder.call(
+            "GET /api/tweets", lambda: client.get("/api/tweets", headers=headers)
+        )
+        cursor = response.json().get("next_cursor") if response is not None else None
+        if cursor and rnd.random() < 0.3:
+            await recorder.call(
+                "GET /api/tweets?cursor",
+                lambda: client.get(
+                    "/api/tweets", params={"cursor": cursor}, headers=headers
+                ),
+            )
+
+    async def me() -> None:
+        await recorder.call(
+            "GET /api/users/me", lambda: client.get("/api/users/me", headers=headers)
+        )
+
+    async def profile() -> None:
+        user_id = rnd.randint(1, users)
+        await recorder.call(
+            "GET /api/users/{id}",
+            lambda: client.get("/api/users/{0}".format(user_id), headers=headers),
+        )
+
+    async def like() -> None:
+        url = "/api/tweets/{0}/likes".format(rnd.randint(1, tweets))
+        await recorder.call(
+            "POST /api/tweets/{id}/likes", lambda: client.post(url, headers=headers)
+        )
+        await recorder.call(
+            "DELETE /api/tweets/{id}/likes", lambda: client.delete(url, headers=headers)
+        )
+
+    async def follow() -> None:
+        url = "/api/users/{0}/follow".format(rnd.randint(1, users))
+        await recorder.call(
+            "POST /api/users/{id}/follow", lambda: client.post(url, headers=headers)
+        )
+        await recorder.call(
+            "DELETE /api/users/{id}/follow", lambda: client.delete(url, headers=headers)
+        )
+
+    async def post_tweet() -> None:
+        response = await recorder.call(
+            "POST /api/medias",
+            lambda: client.post(
+                "/api/medias",
+                files={"file": ("load.jpg", IMAGE, "image/jpeg")},
+                headers=headers,
+            ),
+        )
+        media_ids = (
+            [response.json()["media_id"]]
+            if response is not None and response.status_code == 201
+            else []
+        )
+        await recorder.call(
+            "POST /api/tweets",
+            lambda: client.post(
+                "/api/tweets",
+                json={"tweet_data": "Load test tweet", "tweet_media_ids": media_ids},
+                headers=headers,
+            ),
+        )
+
+    scenarios = [feed, me, profile, like, follow, post_tweet]
+    weights = [50, 10, 10, 15, 10, 5]
+    while time.perf_counter() < deadline:
+        await rnd.choices(scenarios, weights)[0]()
+
+
+@asynccontextmanager
+async def local_client(
+    args: argparse.Namespace,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Приложение в том же процессе поверх засеянного тестового контейнера."""
+    async with benchmark_database() as (_, session_maker):
+        await seed_scale(session_maker, args.users, args.tweets, args.likes, args.follows)
+
+        async def override_session() -> AsyncIterator[AsyncSession]:
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = override_session
+        app.dependency_overrides[get_read_session] = override_session
+        crud.utils.media_deletion_queue.session_maker = session_maker
+        with tempfile.TemporaryDirectory() as images:
+            # Картинки пишем во временную директорию, а не в dist/images.
+            service.OUT_PATH = crud.utils.OUT_PATH = Path(images)
+            # Кэши процесса могли остаться от предыдущего запуска в том же интерпретаторе.
+            auth_cache.clear()
+            await feed_cache.invalidate()
+            async with httpx.AsyncClient(app=app, base_url="http://load") as client:
+                yield client
+            await crud.utils.media_deletion_queue.stop()
+        app.dependency_overrides.clear()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    recorder = Recorder()
+    client_context: AsyncContextManager[httpx.AsyncClient]
+    if args.base_url:
+        limits = httpx.Limits(max_connections=args.clients)
+        client_context = httpx.AsyncClient(base_url=args.base_url, limits=limits)
+    else:
+        client_context = local_client(args)
+
+    async with client_context as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(
+                run_client(client, recorder, args.users, args.tweets, deadline, number)
+                for number in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(timings) for timings in recorder.timings.values())
+    return {
+        "benchmark": "load_test",
+        "target": args.base_url or "in-process",
+        "scale": {
+            "users": args.users,
+            "tweets": args.tweets,
+            "likes": args.likes,
+            "follows": args.follows,
+        },
+        "clients": args.clients,
+        "duration_s": round(elapsed, 1),
+        "throughput_rps": round(total / elapsed, 1),
+        "endpoints": recorder.results(elapsed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--tweets", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--follows", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--base-url", help="Load a running server instead of the app")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
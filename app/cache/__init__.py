@@ -0,0 +1,8 @@
+__all__ = (
+    "UserIdentity",
+    "auth_cache",
+    "feed_cache",
+)
+
+from .auth import UserIdentity, auth_cache
+from .feed import feed_cache
@@ -0,0 +1,92 @@
+"""In-process cache of users authenticated by api_key."""
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+from config import auth_cache_size, auth_cache_ttl
+from metrics import CACHE_REQUESTS
+
+AUTH_CACHE_HITS = CACHE_REQUESTS.labels(cache="auth", result="hit")
+AUTH_CACHE_MISSES = CACHE_REQUESTS.labels(cache="auth", result="miss")
+
+
+class UserIdentity(NamedTuple):
+    """Lightweight user identity, not bound to any database session."""
+
+    id: int
+    name: str
+
+
+class AuthCache:
+    """Bounded LRU cache api_key -> UserIdentity with a time to live for each entry."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._items: OrderedDict[str, Tuple[float, UserIdentity]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, api_key: str) -> UserIdentity | None:
+        """
+        Получаем пользователя из кэша.
+
+        :param api_key: Ключ для аутентификации пользователя.
+        :return UserIdentity | None: Пользователь, если он есть в кэше и запись не устарела.
+        """
+        item = self._items.get(api_key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[api_key]
+            self.misses += 1
+            AUTH_CACHE_MISSES.inc()
+            return None
+
+        self._items.move_to_end(api_key)
+        self.hits += 1
+        AUTH_CACHE_HITS.inc()
+        return item[1]
+
+    def set(self, api_key: str, identity: UserIdentity) -> None:
+        """
+        Сохраняем пользователя в кэш, при переполнении вытесняем самую старую запись.
+
+        :param api_key: Ключ для аутентификации пользователя.
+        :param identity: Пользователь.
+        :return None: Ничего не возвращаем.
+        """
+        self._items[api_key] = (time.monotonic() + self.ttl, identity)
+        self._items.move_to_end(api_key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, api_key: str) -> None:
+        """
+        Удаляем из кэша запись по api_key, например при смене ключа пользователя.
+
+        :param api_key: Ключ для аутентификации пользователя.
+        :return None: Ничего не возвращаем.
+        """
+        self._items.pop(api_key, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Удаляем из кэша все записи пользователя, например при его удалении или
+        переименовании.
+
+        :param user_id: ID пользователя.
+        :return None: Ничего не возвращаем.
+        """
+        stale = [key for key, (_, user) in self._items.items() if user.id == user_id]
+        for key in stale:
+            del self._items[key]
+
+    def clear(self) -> None:
+        """Полная очистка кэша."""
+        self._items.clear()
+
+
+auth_cache = AuthCache(auth_cache_size, auth_cache_ttl)
@@ -0,0 +1,233 @@
+"""Cache of serialized feed pages, invalidated by writes to tweets and likes."""
+import logging
+import time
+from collections import OrderedDict
+from types import ModuleType
+from typing import Optional, Protocol, Tuple
+
+from config import (
+    REDIS_URL,
+    db_settings,
+    feed_cache_backend,
+    feed_cache_size,
+    feed_cache_ttl,
+    web_concurrency,
+)
+from metrics import CACHE_REQUESTS
+
+aioredis: Optional[ModuleType]
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "feed:generation"
+
+FEED_CACHE_HITS = CACHE_REQUESTS.labels(cache="feed", result="hit")
+FEED_CACHE_MISSES = CACHE_REQUESTS.labels(cache="feed", result="miss")
+
+
+class FeedCacheBackend(Protocol):
+    """Storage for cached feed pages."""
+
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    async def incr(self, key: str) -> int:
+        ...
+
+
+class MemoryBackend:
+    """Process-local storage, each worker has its own copy of the cache."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._items.pop(key, None)
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisBackend:
+    """Storage shared by all workers, keeps the cache coherent between processes."""
+
+    def __init__(self, url: str) -> None:
+        if aioredis is None:
+            raise RuntimeError("Install the redis package to use the redis feed cache")
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._redis.set(key, value, px=int(ttl * 1000))
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+
+class FeedCache:
+    """
+    Feed pages are stored under a key that contains the cache generation.
+    Any write that changes the feed bumps the generation, after which all
+    previously stored pages are no longer read and expire on their own.
+    Without a backend the cache is disabled and every page is read from the database.
+
+    Replicas may still lag behind a write for replica_window seconds, so during this
+    window after a bump pages built on a replica are not stored in the new generation.
+    """
+
+    def __init__(
+        self,
+        backend: FeedCacheBackend | None,
+        ttl: float,
+        replica_window: float = 0.0,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.replica_window = replica_window
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def _key(generation: int, scope: str, cursor: str | None, limit: int) -> str:
+        return "feed:{0}:{1}:{2}:{3}".format(generation, scope, cursor or "", limit)
+
+    @staticmethod
+    def _fresh_key(generation: int) -> str:
+        return "feed:fresh:{0}".format(generation)
+
+    async def get(
+        self,
+        scope: str,
+        cursor: str | None,
+        limit: int,
+    ) -> Tuple[int, bytes | None]:
+        """
+        Получаем страницу ленты из кэша.
+
+        :param scope: Вид ленты: общая или лента подписок конкретного пользователя.
+        :param cursor: Курсор страницы.
+        :param limit: Размер страницы.
+        :return Tuple: Текущее поколение кэша и страница, если она есть в кэше.
+        Поколение нужно передать в set, чтобы страница, собранная во время записи,
+        не попала в кэш как актуальная.
+        """
+        if self.backend is None:
+            return -1, None
+        try:
+            generation = int(await self.backend.get(GENERATION_KEY) or 0)
+            value = await self.backend.get(self._key(generation, scope, cursor, limit))
+        except Exception:
+            logger.exception("Feed cache is unavailable")
+            return -1, None
+
+        if value is None:
+            self.misses += 1
+            FEED_CACHE_MISSES.inc()
+        else:
+            self.hits += 1
+            FEED_CACHE_HITS.inc()
+        return generation, value
+
+    async def set(
+        self,
+        generation: int,
+        scope: str,
+        cursor: str | None,
+        limit: int,
+        value: bytes,
+        from_replica: bool = False,
+    ) -> None:
+        """
+        Сохраняем сериализованную страницу ленты. Страницу, собранную на реплике
+        вскоре после записи, не сохраняем: реплика могла еще не получить эту запись,
+        а страница отдавалась бы всем пользователям до конца TTL.
+
+        :param generation: Поколение кэша, полученное из get до запроса в бд.
+        :param scope: Вид ленты.
+        :param cursor: Курсор страницы.
+        :param limit: Размер страницы.
+        :param value: Готовый JSON ответа.
+        :param from_replica: Страница прочитана с реплики.
+        :return None: Ничего не возвращаем.
+        """
+        if generation < 0 or self.backend is None:
+            return
+        try:
+            if from_replica and await self.backend.get(self._fresh_key(generation)):
+                return
+            await self.backend.set(
+                self._key(generation, scope, cursor, limit), value, self.ttl
+            )
+        except Exception:
+            logger.exception("Feed cache is unavailable")
+
+    async def invalidate(self) -> None:
+        """Делаем устаревшими все сохраненные страницы ленты."""
+        if self.backend is None:
+            return
+        try:
+            generation: int = await self.backend.incr(GENERATION_KEY)
+            if self.replica_window > 0:
+                # Пока отметка жива, страницы с реплик в это поколение не попадают.
+                await self.backend.set(
+                    self._fresh_key(generation), b"1", self.replica_window
+                )
+        except Exception:
+            logger.exception("Feed cache is unavailable")
+
+
+def create_backend() -> FeedCacheBackend | None:
+    """
+    Создаем хранилище для кэша ленты в зависимости от настроек. Кэш в памяти
+    процесса не запускаем при нескольких воркерах: поколение, увеличенное записью
+    в одном воркере, не видно остальным, и они отдавали бы устаревшую ленту.
+
+    :return FeedCacheBackend | None: Хранилище кэша или None, если кэш выключен.
+    """
+    if feed_cache_backend == "redis":
+        if not REDIS_URL:
+            raise RuntimeError("Set REDIS_URL to use the redis feed cache")
+        return RedisBackend(REDIS_URL)
+    if feed_cache_backend == "memory":
+        if web_concurrency > 1:
+            raise RuntimeError(
+                "The memory feed cache is not shared between {0} workers, "
+                "use FEED_CACHE_BACKEND=redis or off".format(web_concurrency)
+            )
+        return MemoryBackend(feed_cache_size)
+    if feed_cache_backend == "off":
+        return None
+    raise RuntimeError("Unknown FEED_CACHE_BACKEND {0!r}".format(feed_cache_backend))
+
+
+feed_cache = FeedCache(
+    create_backend(),
+    feed_cache_ttl,
+    db_settings.replica_sticky_window if db_settings.replica_urls else 0.0,
+)
@@ -1,24 +1,208 @@
 """Getting environment variables, as well as some application settings."""
 import os
+from typing import List
+from uuid import uuid4
 
 from dotenv import load_dotenv
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 load_dotenv()
 
-DB_NAME = os.environ.get("DB_NAME")
-DB_USER = os.environ.get("DB_USER")
-DB_PASS = os.environ.get("DB_PASS")
+
+class DatabaseSettings(BaseSettings):
+    """Database connection and pool settings, read from DB_* environment variables."""
+
+    model_config = SettingsConfigDict(env_prefix="DB_", extra="ignore")
+
+    name: str | None = None
+    user: str | None = None
+    password: str | None = Field(default=None, validation_alias="DB_PASS")
+    host: str = "db"
+    port: int = 5432
+    echo: bool = False
+
+    # Пул соединений считается на один процесс, при нескольких воркерах
+    # общее количество соединений умножается на количество воркеров.
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = False
+    # Таймаут установки соединения и выполнения запроса в секундах.
+    connect_timeout: float = 10.0
+    command_timeout: float | None = None
+    # Размер кэша подготовленных выражений asyncpg на одно соединение.
+    statement_cache_size: int = 100
+
+    # Работа через PgBouncer в режиме transaction: соединение с сервером меняется
+    # между транзакциями, поэтому подготовленные выражения кэшировать нельзя.
+    pgbouncer: bool = False
+
+    # Реплики для чтения через запятую в виде host или host:port, с теми же
+    # пользователем и бд что и у основного сервера. Пустая строка - реплик нет.
+    replica_hosts: str = ""
+    # Сколько секунд после записи пользователь читает с основного сервера,
+    # чтобы видеть свои изменения несмотря на отставание реплик.
+    replica_sticky_window: float = 5.0
+    # Сколько секунд не обращаться к реплике, к которой не удалось подключиться.
+    replica_retry_interval: float = 30.0
+
+    @property
+    def url(self) -> str:
+        """Строка подключения к бд."""
+        return self.build_url(self.host, self.port)
+
+    @property
+    def replica_urls(self) -> List[str]:
+        """Строки подключения к репликам."""
+        urls: List[str] = []
+        for address in filter(None, map(str.strip, self.replica_hosts.split(","))):
+            host, _, port = address.partition(":")
+            urls.append(self.build_url(host, int(port) if port else self.port))
+        return urls
+
+    def build_url(self, host: str, port: int) -> str:
+        """
+        Строка подключения к серверу бд.
+
+        :param host: Адрес сервера.
+        :param port: Порт сервера.
+        :return str: Строка подключения для asyncpg.
+        """
+        return "postgresql+asyncpg://{0}:{1}@{2}:{3}/{4}".format(
+            self.user,
+            self.password,
+            host,
+            port,
+            self.name,
+        )
+
+    def engine_options(self) -> dict:
+        """
+        Параметры для create_async_engine.
+
+        :return dict: Настройки пула и аргументы подключения asyncpg.
+        """
+        statement_cache_size: int = 0 if self.pgbouncer else self.statement_cache_size
+        connect_args: dict = {
+            "timeout": self.connect_timeout,
+            "command_timeout": self.command_timeout,
+            # Кэш asyncpg внутри соединения и кэш диалекта SQLAlchemy.
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+        if self.pgbouncer:
+            # Уникальные имена, чтобы выражения разных клиентов не конфликтовали
+            # на одном серверном соединении PgBouncer.
+            connect_args["prepared_statement_name_func"] = (
+                lambda: f"__asyncpg_{uuid4()}__"
+            )
+        return {
+            "echo": self.echo,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+            "connect_args": connect_args,
+        }
+
+
+db_settings = DatabaseSettings()
+
+DB_NAME = db_settings.name
+DB_USER = db_settings.user
+DB_PASS = db_settings.password
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# Ключ для служебных эндпоинтов /api/admin, если не задан - они отключены.
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+
+# Режим отладки: количество SQL выражений запроса отдается в заголовках X-Query-*.
+debug: bool = os.environ.get("DEBUG", "").lower() in ("1", "true", "yes")
+
+# Журнал медленных запросов включается порогом в миллисекундах SLOW_QUERY_THRESHOLD_MS.
+# В журнал попадает доля slow_query_sample_rate медленных выражений, план EXPLAIN
+# снимается не чаще раза в slow_query_explain_interval секунд и не дольше
+# slow_query_explain_timeout секунд, хранится slow_query_log_size последних записей.
+slow_query_threshold: float | None = (
+    float(os.environ["SLOW_QUERY_THRESHOLD_MS"])
+    if os.environ.get("SLOW_QUERY_THRESHOLD_MS")
+    else None
+)
+slow_query_sample_rate: float = 1.0
+slow_query_explain_interval: float = 10.0
+slow_query_explain_timeout: float = 5.0
+slow_query_log_size: int = 100
 
 # Выбор какие сообщения показывать. От подписчиков или все.
 tweet_followers: bool = False
 
-# Количество твитов в response.
+# Кэш аутентификации по api_key: сколько ключей хранить и сколько секунд
+# доверять сохраненному пользователю без запроса в бд.
+auth_cache_size: int = 10_000
+auth_cache_ttl: float = 60.0
+
+# Количество процессов приложения, gunicorn.conf.py выставляет его по числу воркеров.
+web_concurrency: int = int(os.environ.get("WEB_CONCURRENCY") or 1)
+
+# Кэш готовых страниц ленты. memory - кэш внутри процесса, допустим только при одном
+# воркере, иначе запись в одном воркере не инвалидирует кэш остальных; redis - общий
+# кэш для всех воркеров (нужен REDIS_URL); off - кэш выключен. По умолчанию redis,
+# если задан REDIS_URL, иначе memory для одного воркера и off для нескольких.
+# TTL страховка на случай потерянной инвалидации.
+feed_cache_backend: str = os.environ.get("FEED_CACHE_BACKEND") or (
+    "redis" if REDIS_URL else "memory" if web_concurrency == 1 else "off"
+)
+feed_cache_size: int = 1_000
+feed_cache_ttl: float = 30.0
+
+# Сколько секунд ждать каждого шага прогрева воркера при запуске: открытия
+# соединений пула и первых запросов горячих эндпоинтов.
+warmup_timeout: float = 10.0
+
+# Как часто в секундах сверять счетчики подписчиков, подписок и твитов пользователей
+# с реальным количеством строк.
+counters_reconcile_interval: float = 3600.0
+
+# Лента подписок хранится в таблице home_timeline. Если у автора подписчиков больше
+# этого количества, новый твит раскладывается по лентам в фоне, а не в запросе.
+fan_out_sync_limit: int = 1_000
+
+# Сколько последних твитов автора добавлять в ленту при подписке на него.
+timeline_backfill_limit: int = 1_000
+
+# Количество твитов в response по умолчанию и максимальное количество,
+# которое клиент может запросить за одну страницу.
 number_of_tweets: int = 100
+max_number_of_tweets: int = 100
+
+# Сколько лайкнувших пользователей показывать в ленте у каждого твита, полный
+# список отдается отдельным запросом постранично.
+likes_sample_size: int = 3
+number_of_likes: int = 50
+max_number_of_likes: int = 100
+
+# Количество подписчиков и подписок на странице по умолчанию и максимальное.
+number_of_follows: int = 50
+max_number_of_follows: int = 100
 
 # Минимальная и максимальная длина твитов. Если меняете, то нужно выполнить миграции.
 max_length_tweet: int = 10_000
 min_length_tweet: int = 5
 
 # Допустимые форматы картинок, если хотите добавить допустим формат gif,
-# то нужно отредактировать nginx.conf (jpeg|png|jpg|webp|gif)
+# то нужно добавить его сигнатуру в service.image_extension.
 allowed_types: tuple = ("image/jpg", "image/png", "image/jpeg", "image/webp")
+
+# Максимальный размер картинки в байтах и размер блока, которым файл пишется на диск.
+max_image_size: int = 10 * 1024 * 1024
+upload_chunk_size: int = 64 * 1024
+
+# Удаление картинок: количество потоков, размер пачки файлов,
+# количество повторов при ошибке и пауза перед повтором в секундах.
+media_delete_workers: int = 4
+media_delete_batch_size: int = 100
+media_delete_retries: int = 3
+media_delete_retry_delay: float = 1.0
@@ -0,0 +1,98 @@
+"""Reconciliation of the denormalized counters on users with the actual rows."""
+import asyncio
+import logging
+
+from models.db_conf import async_session_maker
+from models.model import Tweet, User, followers
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock, чтобы при нескольких воркерах сверка шла только в одном из них.
+RECONCILE_LOCK_KEY: int = 7_340_001
+
+
+async def reconcile_user_counters(session: AsyncSession) -> int:
+    """
+    Функция пересчитывает подписчиков, подписки и твиты всех пользователей
+    и одним запросом исправляет счетчики, которые разошлись с реальными данными.
+    Если сверку уже выполняет другой процесс, ничего не делаем.
+
+    :param session: Сессия для работы с бд.
+    :return int: Количество пользователей, у которых были исправлены счетчики.
+    """
+    locked: bool = bool(
+        await session.scalar(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY)))
+    )
+    if not locked:
+        return 0
+
+    followers_count = (
+        select(followers.c.followed_id.label("user_id"), func.count().label("total"))
+        .group_by(followers.c.followed_id)
+        .subquery()
+    )
+    following_count = (
+        select(followers.c.follower_id.label("user_id"), func.count().label("total"))
+        .group_by(followers.c.follower_id)
+        .subquery()
+    )
+    tweets_count = (
+        select(Tweet.user_id, func.count().label("total"))
+        .group_by(Tweet.user_id)
+        .subquery()
+    )
+    user = aliased(User)
+    actual = (
+        select(
+            user.id,
+            func.coalesce(followers_count.c.total, 0).label("followers_count"),
+            func.coalesce(following_count.c.total, 0).label("following_count"),
+            func.coalesce(tweets_count.c.total, 0).label("tweets_count"),
+        )
+        .outerjoin(followers_count, followers_count.c.user_id == user.id)
+        .outerjoin(following_count, following_count.c.user_id == user.id)
+        .outerjoin(tweets_count, tweets_count.c.user_id == user.id)
+        .subquery()
+    )
+    stmt = (
+        update(User)
+        .where(
+            User.id == actual.c.id,
+            or_(
+                User.followers_count != actual.c.followers_count,
+                User.following_count != actual.c.following_count,
+                User.tweets_count != actual.c.tweets_count,
+            ),
+        )
+        .values(
+            followers_count=actual.c.followers_count,
+            following_count=actual.c.following_count,
+            tweets_count=actual.c.tweets_count,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount
+
+
+async def reconcile_counters_periodically(interval: float) -> None:
+    """
+    Фоновая задача, которая раз в interval секунд сверяет счетчики пользователей.
+    Ошибки логируются и не останавливают задачу.
+
+    :param interval: Пауза между сверками в секундах.
+    :return None: Ничего не возвращаем, задача работает до отмены.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session_maker() as session:
+                fixed: int = await reconcile_user_counters(session)
+            if fixed:
+                logger.warning("Reconciled counters of %s users", fixed)
+        except Exception:
+            logger.exception("Counters reconciliation failed")
@@ -1,9 +1,10 @@
 """Module for database query operations with the Image model"""
-from typing import List, Dict
+from typing import List, Dict, Set
 
-from models.model import Image
+from models.model import Image, media_files
 from schemas.tweet_schema import AddTweetSchema
-from sqlalchemy import ScalarResult, select
+from sqlalchemy import ARRAY, Integer, String, any_, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -20,42 +21,120 @@ async def transform_image_id_in_image_url(
     список имен картинок твита.
     """
     unpack: dict = tweet_in.model_dump()
-    media: ScalarResult[str] = await get_image_url(session, unpack["tweet_media_ids"])
-
-    # Удаляем данные о картинке из бд, так как они нам больше не нужны.
-    await remove_image_id_in_db(session, unpack["tweet_media_ids"])
-    unpack["tweet_media_ids"] = list(media)
+    unpack["tweet_media_ids"] = await pop_image_urls(session, unpack["tweet_media_ids"])
     return unpack
 
 
-async def get_image_url(
+async def pop_image_urls(
     session: AsyncSession,
     image_id_list: List[int],
-) -> ScalarResult[str]:
+) -> List[str]:
     """
-    Функция получает список имен картинок.
+    Функция одним запросом удаляет данные о картинках из бд, так как после привязки
+    к твиту они больше не нужны, и возвращает имена картинок. Коммит не делается,
+    поэтому удаление попадает в одну транзакцию с сохранением твита.
 
     :param session: Сессия для работы с бд.
     :param image_id_list: Список id картинок.
-    :return image_url: Список имен картинок."""
-    stmt = select(Image.url).where(Image.id.in_(image_id_list))
-    return await session.scalars(stmt)
+    :return List[str]: Имена картинок в том же порядке, в котором пришли id.
+    """
+    if not image_id_list:
+        return []
 
+    stmt = (
+        delete(Image)
+        .where(Image.id == any_(literal(image_id_list, ARRAY(Integer))))
+        .returning(Image.id, Image.url)
+        .execution_options(synchronize_session=False)
+    )
+    rows = await session.execute(stmt)
+    urls: Dict[int, str] = {row.id: row.url for row in rows}
 
-async def remove_image_id_in_db(
-    session: AsyncSession,
-    image_id_list: List[int],
-) -> None:
+    # DELETE ... RETURNING не гарантирует порядок строк, восстанавливаем порядок вложений.
+    return [urls[img_id] for img_id in dict.fromkeys(image_id_list) if img_id in urls]
+
+
+# Пространство ключей advisory lock для файлов хранилища, второй ключ - hashtext пути.
+MEDIA_LOCK_NAMESPACE: int = 7_340_002
+
+
+async def lock_media(session: AsyncSession, keys: List[str]) -> Set[str]:
     """
-    Функция удаляет данные о картинке из бд.
+    Функция берет транзакционные блокировки путей хранилища и возвращает те из них,
+    на которые есть ссылки. Загрузка кладет файл, а очередь удаления удаляет его
+    только под этой блокировкой, поэтому файл, на который только что сослалась
+    новая загрузка, не будет удален. Блокировки снимаются при коммите или откате.
 
     :param session: Сессия для работы с бд.
-    :param image_id_list: Список id картинок.
-    :return None: Ничего не возвращает.
-    """
-    for img_id in image_id_list:
-        stmt = select(Image).where(Image.id == img_id)
-        img: Image | None = await session.scalar(stmt)
-        if img:
-            await session.delete(img)
-    await session.commit()
+    :param keys: Пути картинок в хранилище.
+    :return Set[str]: Пути, на которые есть ссылки в media_files.
+    """
+    if not keys:
+        return set()
+
+    refs = select(
+        func.unnest(literal(sorted(set(keys)), ARRAY(String))).label("key")
+    ).subquery()
+    # Блокировки берутся в порядке путей, чтобы два воркера не ждали друг друга.
+    await session.execute(
+        select(
+            func.pg_advisory_xact_lock(MEDIA_LOCK_NAMESPACE, func.hashtext(refs.c.key))
+        ).order_by(refs.c.key)
+    )
+    stmt = select(media_files.c.key).where(
+        media_files.c.key == any_(literal(keys, ARRAY(String))),
+        media_files.c.refcount > 0,
+    )
+    return set(await session.scalars(stmt))
+
+
+async def add_media_reference(session: AsyncSession, key: str) -> None:
+    """
+    Добавляем ссылку на файл хранилища, для нового файла создается строка
+    со счетчиком 1. Коммит не делается.
+
+    :param session: Сессия для работы с бд.
+    :param key: Путь картинки в хранилище.
+    :return None: Ничего не возвращаем.
+    """
+    stmt = pg_insert(media_files).values(key=key, refcount=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[media_files.c.key],
+        set_={"refcount": media_files.c.refcount + 1},
+    )
+    await session.execute(stmt)
+
+
+async def release_media(session: AsyncSession, keys: List[str]) -> List[str]:
+    """
+    Функция уменьшает счетчики ссылок на файлы удаляемого твита и удаляет строки
+    файлов, на которые больше никто не ссылается. Коммит не делается, файлы
+    нужно удалить из хранилища после коммита.
+
+    :param session: Сессия для работы с бд.
+    :param keys: Пути картинок твита, один файл может встречаться несколько раз.
+    :return List[str]: Файлы, которые можно удалить из хранилища.
+    """
+    if not keys:
+        return []
+
+    refs = select(func.unnest(literal(keys, ARRAY(String))).label("key")).subquery()
+    released = (
+        select(refs.c.key, func.count().label("total"))
+        .group_by(refs.c.key)
+        .subquery()
+    )
+    await session.execute(
+        update(media_files)
+        .where(media_files.c.key == released.c.key)
+        .values(refcount=media_files.c.refcount - released.c.total)
+    )
+    stmt = (
+        delete(media_files)
+        .where(
+            media_files.c.key == any_(literal(keys, ARRAY(String))),
+            media_files.c.refcount <= 0,
+        )
+        .returning(media_files.c.key)
+    )
+    return list(await session.scalars(stmt))
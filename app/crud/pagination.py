@@ -0,0 +1,51 @@
+"""Encoding and decoding of opaque cursors for keyset pagination."""
+import base64
+import binascii
+from typing import Tuple
+
+from fastapi import HTTPException
+from starlette import status
+
+# Значения ключа сортировки - колонки типа integer, большее значение Postgres
+# не примет и вернет ошибку вместо 400.
+MAX_CURSOR_VALUE: int = 2**31 - 1
+
+
+def encode_cursor(*values: int) -> str:
+    """
+    Упаковываем значения ключа сортировки последней записи страницы в непрозрачную строку.
+
+    :param values: Значения ключа сортировки, например (likes_count, tweet_id).
+    :return str: Курсор для получения следующей страницы.
+    """
+    raw: bytes = ":".join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[int, ...]:
+    """
+    Распаковываем курсор обратно в значения ключа сортировки.
+
+    :param cursor: Курсор, пришедший от клиента.
+    :param size: Сколько значений должно быть в курсоре.
+    :return Tuple[int, ...]: Значения ключа сортировки, если курсор поврежден
+    пробрасываем исключение.
+    """
+    try:
+        padding: str = "=" * (-len(cursor) % 4)
+        raw: str = base64.urlsafe_b64decode(cursor + padding).decode()
+        values: Tuple[int, ...] = tuple(int(value) for value in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = ()
+
+    if len(values) == size and all(0 <= value <= MAX_CURSOR_VALUE for value in values):
+        return values
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail={
+            "result": False,
+            "error_type": "Bad Request",
+            "error_message": "Invalid cursor.",
+        },
+    )
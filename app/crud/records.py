@@ -0,0 +1,38 @@
+"""Compact records for rows of the hot read queries, used instead of ORM objects."""
+from typing import List
+
+from sqlalchemy import Row
+
+
+class FeedTweet:
+    """A tweet of the feed page with its author."""
+
+    __slots__ = (
+        "tweet_id",
+        "content",
+        "attachments",
+        "likes_count",
+        "author_id",
+        "author_name",
+    )
+
+    def __init__(self, row: Row) -> None:
+        self.tweet_id: int = row.tweet_id
+        self.content: str = row.tweet_data
+        self.attachments: List[str] = row.tweet_media_ids
+        self.likes_count: int = row.likes_count
+        self.author_id: int = row.author_id
+        self.author_name: str = row.author_name
+
+
+class UserProfile:
+    """A user with the counters shown on the profile."""
+
+    __slots__ = ("id", "name", "followers_count", "following_count", "tweets_count")
+
+    def __init__(self, row: Row) -> None:
+        self.id: int = row.id
+        self.name: str = row.name
+        self.followers_count: int = row.followers_count
+        self.following_count: int = row.following_count
+        self.tweets_count: int = row.tweets_count
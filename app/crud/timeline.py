@@ -0,0 +1,108 @@
+"""Module for maintaining the materialized home timeline of followed users' tweets."""
+import logging
+
+from cache import feed_cache
+from config import timeline_backfill_limit
+from models.db_conf import async_session_maker
+from models.model import Tweet, followers, home_timeline
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+async def fan_out_tweet(session: AsyncSession, tweet_id: int, author_id: int) -> None:
+    """
+    Функция раскладывает новый твит в ленты всех подписчиков автора одним запросом.
+
+    :param session: Сессия для работы с бд.
+    :param tweet_id: Идентификатор нового твита.
+    :param author_id: ID автора твита.
+    :return None: Ничего не возвращаем, коммит остается за вызывающим кодом.
+    """
+    subscribers = select(
+        followers.c.follower_id,
+        literal(tweet_id),
+    ).where(followers.c.followed_id == author_id)
+    stmt = insert(home_timeline).from_select(["user_id", "tweet_id"], subscribers)
+    await session.execute(stmt)
+
+
+async def fan_out_tweet_in_background(tweet_id: int, author_id: int) -> None:
+    """
+    Раскладка твита по лентам в отдельной сессии, используется как фоновая задача
+    для авторов с большим количеством подписчиков.
+
+    :param tweet_id: Идентификатор нового твита.
+    :param author_id: ID автора твита.
+    :return None: Ничего не возвращаем.
+    """
+    try:
+        async with async_session_maker() as session:
+            await fan_out_tweet(session, tweet_id, author_id)
+            await session.commit()
+        await feed_cache.invalidate()
+    except Exception:
+        logger.exception("Fan-out of tweet %s failed", tweet_id)
+
+
+async def backfill_timeline(
+    session: AsyncSession,
+    follower_id: int,
+    followed_id: int,
+) -> None:
+    """
+    При подписке добавляем в ленту подписчика последние твиты автора.
+
+    :param session: Сессия для работы с бд.
+    :param follower_id: ID пользователя, который подписался.
+    :param followed_id: ID пользователя, на которого подписались.
+    :return None: Ничего не возвращаем.
+    """
+    recent_tweets = (
+        select(literal(follower_id), Tweet.tweet_id)
+        .where(Tweet.user_id == followed_id)
+        .order_by(Tweet.tweet_id.desc())
+        .limit(timeline_backfill_limit)
+    )
+    stmt = (
+        pg_insert(home_timeline)
+        .from_select(["user_id", "tweet_id"], recent_tweets)
+        .on_conflict_do_nothing()
+    )
+    await session.execute(stmt)
+
+
+async def prune_timeline(
+    session: AsyncSession,
+    follower_id: int,
+    followed_id: int,
+) -> None:
+    """
+    При отписке убираем из ленты подписчика все твиты автора.
+
+    :param session: Сессия для работы с бд.
+    :param follower_id: ID пользователя, который отписался.
+    :param followed_id: ID пользователя, от которого отписались.
+    :return None: Ничего не возвращаем.
+    """
+    author_tweets = select(Tweet.tweet_id).where(Tweet.user_id == followed_id)
+    stmt = delete(home_timeline).where(
+        home_timeline.c.user_id == follower_id,
+        home_timeline.c.tweet_id.in_(author_tweets),
+    )
+    await session.execute(stmt)
+
+
+async def remove_tweet_from_timelines(session: AsyncSession, tweet_id: int) -> None:
+    """
+    Удаляем твит из лент всех пользователей.
+
+    :param session: Сессия для работы с бд.
+    :param tweet_id: Идентификатор удаляемого твита.
+    :return None: Ничего не возвращаем.
+    """
+    stmt = delete(home_timeline).where(home_timeline.c.tweet_id == tweet_id)
+    await session.execute(stmt)
+
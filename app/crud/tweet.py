@@ -1,25 +1,50 @@
 """Module for database query operations for working with tweets."""
-from typing import List, Dict, Sequence
+from collections import defaultdict
+from typing import List, Dict, Sequence, Set, Tuple
 
-from fastapi import HTTPException
+from fastapi import BackgroundTasks, HTTPException
 from starlette import status
 
-from config import tweet_followers, number_of_tweets
-from crud.image import transform_image_id_in_image_url
-from crud.user import get_full_user_data
+from cache import UserIdentity, feed_cache
+from config import (
+    fan_out_sync_limit,
+    likes_sample_size,
+    number_of_likes,
+    number_of_tweets,
+    tweet_followers,
+)
+from crud.image import release_media, transform_image_id_in_image_url
+from crud.records import FeedTweet
+from crud.timeline import (
+    fan_out_tweet,
+    fan_out_tweet_in_background,
+    remove_tweet_from_timelines,
+)
+from crud.user import change_tweets_count, user_not_found
 
 from crud.utils import remove_images
-from models.model import Tweet, User, followers, likes_table
+from models.model import Tweet, User, home_timeline, likes_table
 from schemas.tweet_schema import AddTweetSchema
-from sqlalchemy import desc, func, select, ScalarResult
+from sqlalchemy import (
+    Row,
+    delete,
+    insert,
+    literal,
+    select,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 async def add_tweet_in_db(
     session: AsyncSession,
-    user: User,
+    user: UserIdentity,
     tweet_in: AddTweetSchema,
+    background_tasks: BackgroundTasks | None = None,
 ) -> int:
     """
     Функция для сбора нужных данных для отправки на сохранение твита, и непосредственно
@@ -28,94 +53,211 @@ async def add_tweet_in_db(
     :param session: Сессия для работы с бд.
     :param user: Пользователь, который написал твит.
     :param tweet_in: Данные пришедшие с frontend и прошедшие валидацию.
+    :param background_tasks: Фоновые задачи запроса, в них уходит раскладка твита
+    по лентам, если у автора много подписчиков.
     :return int: Возвращает id сохраненного твита.
     """
-    # Подгружает полные данные о пользователе, иначе будет падать с ошибкой.
-    user_full_data: User | None = await get_full_user_data(session, user)
+    # Вставляем ровно одну строку, профиль автора и его твиты не загружаются,
+    # поэтому время сохранения не зависит от размера аккаунта.
     unpack: Dict[str, List[str]] = await transform_image_id_in_image_url(session, tweet_in)
-    tweet: Tweet = Tweet(**unpack)
+    stmt = insert(Tweet).values(**unpack, user_id=user.id).returning(Tweet.tweet_id)
+    try:
+        tweet_id: int = (await session.execute(stmt)).scalar_one()
+    except IntegrityError:
+        # Нарушен внешний ключ - автора нет в бд.
+        await session.rollback()
+        raise user_not_found()
 
-    if user_full_data is not None:
-        user_full_data.tweets.append(tweet)
-        session.add_all(user_full_data.tweets)
-        await session.commit()
-        return tweet.tweet_id
+    followers_count: int = await change_tweets_count(session, user.id, 1)
+    if tweet_followers:
+        await distribute_tweet(
+            session, tweet_id, user.id, followers_count, background_tasks
+        )
+    await session.commit()
+    await feed_cache.invalidate()
+    return tweet_id
 
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail={
-            "result": False,
-            "error_type": "Not Found",
-            "error_message": "User is not found.",
-        },
-    )
+
+async def distribute_tweet(
+    session: AsyncSession,
+    tweet_id: int,
+    author_id: int,
+    followers_count: int,
+    background_tasks: BackgroundTasks | None,
+) -> None:
+    """
+    Функция раскладывает новый твит по лентам подписчиков. Для небольшого количества
+    подписчиков это делается в той же транзакции, иначе в фоне после ответа клиенту.
+
+    :param session: Сессия для работы с бд.
+    :param tweet_id: Идентификатор нового твита.
+    :param author_id: ID автора твита.
+    :param followers_count: Количество подписчиков автора из счетчика users.
+    :param background_tasks: Фоновые задачи запроса.
+    :return None: Ничего не возвращаем.
+    """
+    if background_tasks is not None:
+        if followers_count > fan_out_sync_limit:
+            background_tasks.add_task(fan_out_tweet_in_background, tweet_id, author_id)
+            return
+    await fan_out_tweet(session, tweet_id, author_id)
 
 
 async def get_all_tweet_followed(
     session: AsyncSession,
-    user_id: int
-) -> Sequence[Tweet]:
+    user_id: int,
+    cursor: Tuple[int, ...] | None = None,
+    limit: int = number_of_tweets,
+) -> List[FeedTweet]:
     """Непосредственно запрос в бд для получения списка твитов. Предусмотрено два вида
     сортировки. По умолчанию получаем все твиты отсортированные по количеству лайков, предусмотрен
     так же запрос для получения твитов только от тех пользователей на которых подписан пользователь.
 
+    Пагинация сделана по ключу сортировки (likes_count, tweet_id), а для ленты подписок,
+    которая идет от новых твитов к старым, по tweet_id, а не через OFFSET,
+    поэтому любая страница стоит столько же, сколько первая. Запрос выбирает только
+    нужные ленте колонки твита и автора, объекты ORM не создаются.
+
     :param session: Сессия для работы с бд.
     :param user_id: Идентификатор пользователя который создает твит.
-    :return Sequence[Tweet]: Возвращаем список твитов.
+    :param cursor: Ключ сортировки последнего твита предыдущей страницы.
+    :param limit: Сколько твитов вернуть.
+    :return List[FeedTweet]: Возвращаем список твитов.
     """
+    columns = (
+        Tweet.tweet_id,
+        Tweet.tweet_data,
+        Tweet.tweet_media_ids,
+        Tweet.likes_count,
+        User.id.label("author_id"),
+        User.name.label("author_name"),
+    )
+    # Значения курсора сравниваются с ключом сортировки как связанные параметры.
+    after = tuple_(*map(literal, cursor or ()))
     if not tweet_followers:
+        # Сортировка идет по денормализованному счетчику лайков, поэтому запрос
+        # читает индекс ix_tweets_likes_count_tweet_id и останавливается на LIMIT.
         stmt = (
-            select(
-                Tweet,
-                func.count(likes_table.c.user_id).label("likes"),
-            )
-            .join(
-                likes_table,
-                (likes_table.c.tweet_id == Tweet.tweet_id),
-                isouter=True,
-            )
-            .group_by(Tweet.tweet_id)
-            .order_by(desc("likes"))
-            .limit(number_of_tweets)
+            select(*columns)
+            .join(User, (User.id == Tweet.user_id))
+            .order_by(Tweet.likes_count.desc(), Tweet.tweet_id.desc())
+            .limit(limit)
         )
+        if cursor is not None:
+            stmt = stmt.where(tuple_(Tweet.likes_count, Tweet.tweet_id) < after)
     else:
+        # Лента подписок заранее разложена в home_timeline, поэтому это чтение одного
+        # диапазона первичного ключа (user_id, tweet_id). Счетчик лайков берется из
+        # tweets при чтении, так что лайк не переписывает строки лент подписчиков.
         stmt = (
-            select(
-                Tweet,
-                func.count(likes_table.c.user_id).label("likes"),
-            )
-            .join(
-                followers,
-                (followers.c.followed_id == Tweet.user_id),
-            )
-            .join(
-                likes_table,
-                (likes_table.c.tweet_id == Tweet.tweet_id),
-                isouter=True,
-            )
-            .where(
-                followers.c.follower_id == user_id,
-            )
-            .group_by(Tweet.tweet_id)
-            .order_by(desc("likes"))
-            .limit(number_of_tweets)
+            select(*columns)
+            .select_from(home_timeline)
+            .join(Tweet, (Tweet.tweet_id == home_timeline.c.tweet_id))
+            .join(User, (User.id == Tweet.user_id))
+            .where(home_timeline.c.user_id == user_id)
+            .order_by(home_timeline.c.tweet_id.desc())
+            .limit(limit)
         )
-    all_tweet: ScalarResult[Tweet] = await session.scalars(stmt)
-    return all_tweet.unique().all()
+        if cursor is not None:
+            stmt = stmt.where(tuple_(home_timeline.c.tweet_id) < after)
+    return [FeedTweet(row) for row in await session.execute(stmt)]
 
 
-async def get_tweet_by_id(session: AsyncSession, tweet_id: int) -> Tweet:
+async def get_likes_sample(
+    session: AsyncSession,
+    tweet_ids: List[int],
+    size: int = likes_sample_size,
+) -> Dict[int, List[Dict[str, int | str]]]:
     """
-    Получение твита по его ID.
+    Получаем для каждого твита страницы не больше size лайкнувших его пользователей.
+    Для каждого твита читается не больше size строк индекса ix_likes_tweet_id_user_id,
+    сколько бы лайков у него ни было.
 
-    :param session:  Сессия для работы с бд.
+    :param session: Сессия для работы с бд.
+    :param tweet_ids: Идентификаторы твитов страницы.
+    :param size: Сколько пользователей вернуть для каждого твита.
+    :return Dict: Словарь tweet_id -> список пользователей.
+    """
+    sample: Dict[int, List[Dict[str, int | str]]] = defaultdict(list)
+    if not tweet_ids or size <= 0:
+        return sample
+
+    page = select(Tweet.tweet_id).where(Tweet.tweet_id.in_(tweet_ids)).subquery("page")
+    likers = (
+        select(likes_table.c.user_id, User.name)
+        .join(User, (User.id == likes_table.c.user_id))
+        .where(likes_table.c.tweet_id == page.c.tweet_id)
+        .order_by(likes_table.c.user_id)
+        .limit(size)
+        .lateral("likers")
+    )
+    stmt = (
+        select(page.c.tweet_id, likers.c.user_id, likers.c.name)
+        .select_from(page)
+        .join(likers, true())
+    )
+    for row in await session.execute(stmt):
+        sample[row.tweet_id].append({"user_id": row.user_id, "name": row.name})
+    return sample
+
+
+async def get_liked_tweet_ids(
+    session: AsyncSession,
+    user_id: int,
+    tweet_ids: List[int],
+) -> Set[int]:
+    """
+    Определяем, какие из твитов страницы лайкнул пользователь.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя.
+    :param tweet_ids: Идентификаторы твитов страницы.
+    :return Set[int]: Идентификаторы лайкнутых пользователем твитов.
+    """
+    if not tweet_ids:
+        return set()
+
+    stmt = select(likes_table.c.tweet_id).where(
+        likes_table.c.user_id == user_id,
+        likes_table.c.tweet_id.in_(tweet_ids),
+    )
+    return set(await session.scalars(stmt))
+
+
+async def get_tweet_likes(
+    session: AsyncSession,
+    tweet_id: int,
+    after_user_id: int | None = None,
+    limit: int = number_of_likes,
+) -> Sequence[Row]:
+    """
+    Постраничное получение пользователей, лайкнувших твит, в порядке их id.
+
+    :param session: Сессия для работы с бд.
     :param tweet_id: Идентификатор твита.
-    :return Tweet: Возвращаем в случае успеха найденный твит."""
-    tweet: Tweet | None = await session.get(Tweet, tweet_id)
-    if tweet is not None:
-        return tweet
+    :param after_user_id: ID последнего пользователя предыдущей страницы.
+    :param limit: Сколько пользователей вернуть.
+    :return Sequence[Row]: Строки с user_id и name, если твита нет пробрасываем исключение.
+    """
+    stmt = (
+        select(likes_table.c.user_id, User.name)
+        .join(User, (User.id == likes_table.c.user_id))
+        .where(likes_table.c.tweet_id == tweet_id)
+        .order_by(likes_table.c.user_id)
+        .limit(limit)
+    )
+    if after_user_id is not None:
+        stmt = stmt.where(likes_table.c.user_id > after_user_id)
+
+    likes: Sequence[Row] = (await session.execute(stmt)).all()
+    if not likes and after_user_id is None and not await tweet_exists(session, tweet_id):
+        raise tweet_not_found()
+    return likes
+
 
-    raise HTTPException(
+def tweet_not_found() -> HTTPException:
+    """Ошибка для запросов к несуществующему твиту."""
+    return HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail={
             "result": False,
@@ -125,6 +267,32 @@ async def get_tweet_by_id(session: AsyncSession, tweet_id: int) -> Tweet:
     )
 
 
+async def get_tweet_by_id(session: AsyncSession, tweet_id: int) -> Tweet:
+    """
+    Получение твита по его ID.
+
+    :param session:  Сессия для работы с бд.
+    :param tweet_id: Идентификатор твита.
+    :return Tweet: Возвращаем в случае успеха найденный твит."""
+    tweet: Tweet | None = await session.get(Tweet, tweet_id)
+    if tweet is not None:
+        return tweet
+
+    raise tweet_not_found()
+
+
+async def tweet_exists(session: AsyncSession, tweet_id: int) -> bool:
+    """
+    Проверка существования твита без загрузки самого твита и его связей.
+
+    :param session:  Сессия для работы с бд.
+    :param tweet_id: Идентификатор твита.
+    :return bool: True если твит есть в бд.
+    """
+    stmt = select(Tweet.tweet_id).where(Tweet.tweet_id == tweet_id)
+    return await session.scalar(stmt) is not None
+
+
 async def delete_tweet_by_id(session: AsyncSession, tweet: Tweet) -> None:
     """
     Функция удаляет твит, а так же делает запрос на
@@ -132,30 +300,61 @@ async def delete_tweet_by_id(session: AsyncSession, tweet: Tweet) -> None:
 
     :param session: Сессия для работы с бд.
     :param tweet: Непосредственно твит для удаления
-    :return None: Ничего не возвращаем.
+    :return None: Ничего не возвращаем, если твит уже удален пробрасываем исключение.
     """
-    list_photo_url: List[str] = tweet.tweet_media_ids
-    await remove_images(list_photo_url)
-    await session.delete(tweet)
+    # Лайки удаляем одним запросом, иначе ORM загрузит всех лайкнувших перед удалением.
+    await session.execute(delete(likes_table).where(likes_table.c.tweet_id == tweet.tweet_id))
+    if tweet_followers:
+        await remove_tweet_from_timelines(session, tweet.tweet_id)
+    deleted = await session.execute(
+        delete(Tweet).where(Tweet.tweet_id == tweet.tweet_id).returning(Tweet.tweet_id)
+    )
+    if deleted.first() is None:
+        # Твит уже удалил параллельный запрос, повторно освобождать его картинки
+        # и уменьшать счетчики нельзя.
+        await session.rollback()
+        raise tweet_not_found()
+
+    await change_tweets_count(session, tweet.user_id, -1)
+    # Одна картинка может быть у нескольких твитов, удаляем только те,
+    # на которые больше никто не ссылается.
+    unreferenced: List[str] = await release_media(session, tweet.tweet_media_ids or [])
     await session.commit()
+    await feed_cache.invalidate()
+
+    # Файлы удаляются только после коммита, чтобы при ошибке бд твит не остался без картинок.
+    await remove_images(unreferenced)
 
 
-async def add_like_in_db(session: AsyncSession, tweet: Tweet, user: User) -> None:
+async def add_like_in_db(
+    session: AsyncSession,
+    tweet_id: int,
+    user: UserIdentity,
+) -> None:
     """
-    Функция для добавления лайка к твиту.
+    Функция для добавления лайка к твиту. Лайк вставляется напрямую в таблицу likes,
+    без загрузки твита и списка лайкнувших, поэтому стоимость не зависит от
+    популярности твита.
 
     :param session: Сессия для работы с бд.
-    :param tweet: Твит к которому нужно добавить лайк.
+    :param tweet_id: Идентификатор твита к которому нужно добавить лайк.
     :param user: Пользователь, который ставит лайк.
     :return None: Ничего не возвращаем в случае успеха, если лайк уже поставлен
-    пробрасываем исключение.
+    или твита нет пробрасываем исключение.
     """
+    stmt = (
+        pg_insert(likes_table)
+        .values(user_id=user.id, tweet_id=tweet_id)
+        .on_conflict_do_nothing()
+    )
     try:
-        tweet.likes.append(user)
-        session.add_all(tweet.likes)
-        await session.commit()
-
+        result = await session.execute(stmt)
     except IntegrityError:
+        # Нарушен внешний ключ - твита с таким id нет.
+        await session.rollback()
+        raise tweet_not_found()
+
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={
@@ -165,20 +364,37 @@ async def add_like_in_db(session: AsyncSession, tweet: Tweet, user: User) -> Non
             },
         )
 
+    await change_likes_count(session, tweet_id, 1)
+    await session.commit()
+    await feed_cache.invalidate()
+
 
-async def delete_like_in_db(session: AsyncSession, tweet: Tweet, user: User) -> None:
+async def delete_like_in_db(
+    session: AsyncSession,
+    tweet_id: int,
+    user: UserIdentity,
+) -> None:
     """
     Функция для снятия лайка у твита.
 
     :param session: Сессия для работы с бд.
-    :param tweet: Твит у которого нужно убрать лайк.
+    :param tweet_id: Идентификатор твита у которого нужно убрать лайк.
     :param user: Пользователь, который хочет удалить лайк.
     :return None: В случае успеха ничего не возвращаем, если лайка
      от этого пользователя нет то пробрасывает исключение."""
-    try:
-        tweet.likes.remove(user)
-        await session.commit()
-    except ValueError:
+    stmt = (
+        delete(likes_table)
+        .where(
+            likes_table.c.user_id == user.id,
+            likes_table.c.tweet_id == tweet_id,
+        )
+        .returning(likes_table.c.tweet_id)
+    )
+    result = await session.execute(stmt)
+    if result.first() is None:
+        # Проверяем существование твита только в редком случае промаха.
+        if not await tweet_exists(session, tweet_id):
+            raise tweet_not_found()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -187,3 +403,25 @@ async def delete_like_in_db(session: AsyncSession, tweet: Tweet, user: User) ->
                 "error_message": "No like found to delete it.",
             },
         )
+
+    await change_likes_count(session, tweet_id, -1)
+    await session.commit()
+    await feed_cache.invalidate()
+
+
+async def change_likes_count(session: AsyncSession, tweet_id: int, delta: int) -> None:
+    """
+    Функция изменяет счетчик лайков твита. Изменение выполняется на стороне бд,
+    поэтому одновременные лайки не затирают друг друга.
+
+    :param session: Сессия для работы с бд.
+    :param tweet_id: Идентификатор твита.
+    :param delta: На сколько изменить счетчик.
+    :return None: Ничего не возвращаем.
+    """
+    stmt = (
+        update(Tweet)
+        .where(Tweet.tweet_id == tweet_id)
+        .values(likes_count=Tweet.likes_count + delta)
+    )
+    await session.execute(stmt)
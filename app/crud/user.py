@@ -1,56 +1,39 @@
 """Module for database query operations for working with users."""
+from typing import Sequence
+
+from config import number_of_follows, tweet_followers
+from cache import UserIdentity, auth_cache, feed_cache
+from crud.records import UserProfile
+from crud.timeline import backfill_timeline, prune_timeline
 from fastapi import HTTPException
-from models.model import User
-from sqlalchemy import select
+from models.model import User, followers
+from sqlalchemy import Column, Row, case, delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 from starlette import status
 
 
-async def get_full_user_data(session: AsyncSession, user: User) -> User | None:
-    """
-    Функция для получения полной информации о пользователе.
-
-    :param session: Сессия для работы с бд.
-    :param user: Пользователь для которого идет сбор информации.
-    :return user: Возвращаем пользователя с нужными данными.
-    """
-    stmt = (
-        select(User)
-        .options(joinedload(User.followed))
-        .options(joinedload(User.follower))
-        .options(joinedload(User.tweets))
-        .filter(User.id == user.id)
-    )
-    return await session.scalar(stmt)
-
-
-async def get_user_data_followed(session: AsyncSession, user_id: int) -> User | None:
+async def get_user_by_api_key(session: AsyncSession, api_key: str) -> UserIdentity:
     """
-    Функция для получения информации о пользователе с его подписками.
-
-    :param session: Сессия для работы с бд.
-    :param user_id: ID пользователя для которого идет сбор информации.
-    :return user: Возвращаем пользователя с нужными данными.
-    """
-    stmt = select(User).options(joinedload(User.followed)).filter(User.id == user_id)
-    return await session.scalar(stmt)
-
-
-async def get_user_by_api_key(session: AsyncSession, api_key: str) -> User:
-    """
-    Получение пользователя по его api_key.
+    Получение пользователя по его api_key. Сначала смотрим в кэш аутентификации,
+    и только при промахе идем в бд.
 
     :param session: Сессия для работы с бд.
     :param api_key: Ключ для аутентификации пользователя.
-    :return user: Если пользователь найден, то возвращаем пользователя,
+    :return user: Если пользователь найден, то возвращаем id и имя пользователя,
     иначе пробрасываем исключение.
     """
-    stmt = select(User).where(User.api_key == api_key)
-    user: User | None = await session.scalar(stmt)
-    if user is not None:
-        return user
+    identity: UserIdentity | None = auth_cache.get(api_key)
+    if identity is not None:
+        return identity
+
+    stmt = select(User.id, User.name).where(User.api_key == api_key)
+    row: Row | None = (await session.execute(stmt)).first()
+    if row is not None:
+        identity = UserIdentity(id=row.id, name=row.name)
+        auth_cache.set(api_key, identity)
+        return identity
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail={
@@ -61,19 +44,32 @@ async def get_user_by_api_key(session: AsyncSession, api_key: str) -> User:
     )
 
 
-async def get_user_by_id(session: AsyncSession, user_id: int) -> User:
+async def get_user_profile(session: AsyncSession, user_id: int) -> UserProfile:
     """
-    Получение пользователя по его ID.
+    Получение данных профиля пользователя по его ID. Выбираются только колонки
+    профиля, объект ORM не создается.
 
     :param session: Сессия для работы с бд.
-    :param user_id: ID для аутентификации пользователя.
-    :return user: Если пользователь найден, то возвращаем пользователя,
+    :param user_id: ID пользователя.
+    :return UserProfile: Если пользователь найден, то возвращаем его профиль,
     иначе пробрасываем исключение.
     """
-    user: User | None = await session.get(User, user_id)
-    if user is not None:
-        return user
-    raise HTTPException(
+    stmt = select(
+        User.id,
+        User.name,
+        User.followers_count,
+        User.following_count,
+        User.tweets_count,
+    ).where(User.id == user_id)
+    row: Row | None = (await session.execute(stmt)).first()
+    if row is not None:
+        return UserProfile(row)
+    raise user_not_found()
+
+
+def user_not_found() -> HTTPException:
+    """Ошибка для запросов к несуществующему пользователю."""
+    return HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail={
             "result": False,
@@ -83,36 +79,151 @@ async def get_user_by_id(session: AsyncSession, user_id: int) -> User:
     )
 
 
+async def user_exists(session: AsyncSession, user_id: int) -> bool:
+    """
+    Проверка существования пользователя без загрузки его данных.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя.
+    :return bool: True если пользователь есть в бд.
+    """
+    stmt = select(User.id).where(User.id == user_id)
+    return await session.scalar(stmt) is not None
+
+
+async def is_following(session: AsyncSession, user_id: int, followed_id: int) -> bool:
+    """
+    Проверка подписки одного пользователя на другого по первичному ключу followers.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID подписчика.
+    :param followed_id: ID пользователя, на которого может быть оформлена подписка.
+    :return bool: True если подписка есть.
+    """
+    stmt = select(followers.c.follower_id).where(
+        followers.c.follower_id == user_id,
+        followers.c.followed_id == followed_id,
+    )
+    return await session.scalar(stmt) is not None
+
+
+async def get_followers(
+    session: AsyncSession,
+    user_id: int,
+    after_user_id: int | None = None,
+    limit: int = number_of_follows,
+) -> Sequence[Row]:
+    """
+    Постраничное получение подписчиков пользователя в порядке их id.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя.
+    :param after_user_id: ID последнего пользователя предыдущей страницы.
+    :param limit: Сколько пользователей вернуть.
+    :return Sequence[Row]: Строки с id и name, если пользователя нет пробрасываем
+    исключение.
+    """
+    return await get_follows_page(
+        session,
+        user_id,
+        followers.c.followed_id,
+        followers.c.follower_id,
+        after_user_id,
+        limit,
+    )
+
+
+async def get_following(
+    session: AsyncSession,
+    user_id: int,
+    after_user_id: int | None = None,
+    limit: int = number_of_follows,
+) -> Sequence[Row]:
+    """
+    Постраничное получение подписок пользователя в порядке id пользователей.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя.
+    :param after_user_id: ID последнего пользователя предыдущей страницы.
+    :param limit: Сколько пользователей вернуть.
+    :return Sequence[Row]: Строки с id и name, если пользователя нет пробрасываем
+    исключение.
+    """
+    return await get_follows_page(
+        session,
+        user_id,
+        followers.c.follower_id,
+        followers.c.followed_id,
+        after_user_id,
+        limit,
+    )
+
+
+async def get_follows_page(
+    session: AsyncSession,
+    user_id: int,
+    owner_column: Column,
+    user_column: Column,
+    after_user_id: int | None,
+    limit: int,
+) -> Sequence[Row]:
+    """
+    Общая выборка страницы из таблицы followers. Фильтр по owner_column и сортировка
+    по user_column идут по составному индексу, поэтому страница читается
+    без сортировки всех подписок пользователя.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя, чьи подписки или подписчиков мы смотрим.
+    :param owner_column: Колонка followers, в которой лежит user_id.
+    :param user_column: Колонка followers с id пользователей, которые попадут в ответ.
+    :param after_user_id: ID последнего пользователя предыдущей страницы.
+    :param limit: Сколько пользователей вернуть.
+    :return Sequence[Row]: Строки с id и name.
+    """
+    stmt = (
+        select(User.id, User.name)
+        .select_from(followers)
+        .join(User, User.id == user_column)
+        .where(owner_column == user_id)
+        .order_by(user_column)
+        .limit(limit)
+    )
+    if after_user_id is not None:
+        stmt = stmt.where(user_column > after_user_id)
+
+    users: Sequence[Row] = (await session.execute(stmt)).all()
+    if not users and after_user_id is None and not await user_exists(session, user_id):
+        raise user_not_found()
+    return users
+
+
 async def add_followed(
     session: AsyncSession,
     user_id: int,
-    user_followed: User
+    followed_id: int,
 ) -> None:
     """
-    Подписка на другого пользователя.
+    Подписка на другого пользователя. Подписка вставляется одной строкой в таблицу
+    followers, список подписок пользователя не загружается.
 
     :param session: Сессия для работы с бд.
     :param user_id: ID для аутентификации пользователя.
-    :param user_followed: Пользователь на которого мы хотим подписаться.
+    :param followed_id: ID пользователя на которого мы хотим подписаться.
     :return None: Ничего не возвращаем, если подписка уже была - пробрасываем исключение.
     """
-    user: User | None = await get_user_data_followed(session, user_id)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={
-                "result": False,
-                "error_type": "Not Found",
-                "error_message": "User is not found.",
-            },
-        )
-
+    stmt = (
+        pg_insert(followers)
+        .values(follower_id=user_id, followed_id=followed_id)
+        .on_conflict_do_nothing()
+    )
     try:
-        user.followed.append(user_followed)
-        session.add_all(user.followed)
-        await session.commit()
-
+        result = await session.execute(stmt)
     except IntegrityError:
+        # Нарушен внешний ключ - пользователя с таким id нет.
+        await session.rollback()
+        raise user_not_found()
+
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={
@@ -122,36 +233,39 @@ async def add_followed(
             }
         )
 
+    await change_follow_counts(session, user_id, followed_id, 1)
+    if tweet_followers:
+        await backfill_timeline(session, user_id, followed_id)
+    await session.commit()
+    if tweet_followers:
+        await feed_cache.invalidate()
+
 
 async def remove_followed(
     session: AsyncSession,
     user_id: int,
-    user_followed: User
+    followed_id: int,
 ) -> None:
     """
     Удаление подписки от пользователя.
 
     :param session: Сессия для работы с бд.
     :param user_id: ID для аутентификации пользователя.
-    :param user_followed: Пользователь от которого мы хотим отписаться.
+    :param followed_id: ID пользователя от которого мы хотим отписаться.
     :return None: Ничего не возвращаем, если подписки нет - пробрасываем исключение.
     """
-    user: User | None = await get_user_data_followed(session, user_id)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={
-                "result": False,
-                "error_type": "Not Found",
-                "error_message": "User is not found.",
-            },
+    stmt = (
+        delete(followers)
+        .where(
+            followers.c.follower_id == user_id,
+            followers.c.followed_id == followed_id,
         )
-
-    try:
-        user.followed.remove(user_followed)
-        await session.commit()
-
-    except ValueError:
+        .returning(followers.c.followed_id)
+    )
+    result = await session.execute(stmt)
+    if result.first() is None:
+        if not await user_exists(session, followed_id):
+            raise user_not_found()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -160,3 +274,63 @@ async def remove_followed(
                 "error_message": "You are not following this user.",
             }
         )
+
+    await change_follow_counts(session, user_id, followed_id, -1)
+    if tweet_followers:
+        await prune_timeline(session, user_id, followed_id)
+    await session.commit()
+    if tweet_followers:
+        await feed_cache.invalidate()
+
+
+async def change_follow_counts(
+    session: AsyncSession,
+    user_id: int,
+    followed_id: int,
+    delta: int,
+) -> None:
+    """
+    Функция одним запросом меняет счетчик подписок подписчика и счетчик подписчиков
+    того, на кого он подписался. Изменение выполняется на стороне бд.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID подписчика.
+    :param followed_id: ID пользователя, на которого подписались или от которого
+    отписались.
+    :param delta: На сколько изменить счетчики.
+    :return None: Ничего не возвращаем.
+    """
+    stmt = (
+        update(User)
+        .where(User.id.in_([user_id, followed_id]))
+        .values(
+            following_count=case(
+                (User.id == user_id, User.following_count + delta),
+                else_=User.following_count,
+            ),
+            followers_count=case(
+                (User.id == followed_id, User.followers_count + delta),
+                else_=User.followers_count,
+            ),
+        )
+    )
+    await session.execute(stmt)
+
+
+async def change_tweets_count(session: AsyncSession, user_id: int, delta: int) -> int:
+    """
+    Функция изменяет счетчик твитов пользователя на стороне бд и тем же запросом
+    возвращает количество его подписчиков.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID автора.
+    :param delta: На сколько изменить счетчик.
+    :return int: Количество подписчиков автора.
+    """
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(tweets_count=User.tweets_count + delta)
+        .returning(User.followers_count)
+    )
+    return await session.scalar(stmt) or 0
@@ -1,20 +1,202 @@
 """Deleting pictures when deleting a tweet."""
+import asyncio
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Tuple
 
+from config import (
+    media_delete_batch_size,
+    media_delete_retries,
+    media_delete_retry_delay,
+    media_delete_workers,
+)
+from crud.image import lock_media
+from models.db_conf import async_session_maker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
 
 OUT_PATH = Path(__file__).parent.parent / "./dist/images"
 OUT_PATH.mkdir(exist_ok=True, parents=True)
 OUT_PATH = OUT_PATH.absolute()
 
+# Адрес, по которому nginx отдает хранилище картинок.
+MEDIA_URL_PREFIX: str = "/images/"
+
+
+def media_key(digest: str, extension: str) -> str:
+    """
+    Путь картинки в хранилище по хэшу ее содержимого. Два уровня подкаталогов
+    из первых символов хэша (256 * 256 каталогов) не дают одному каталогу
+    разрастись до миллионов файлов.
+
+    :param digest: sha256 содержимого в hex.
+    :param extension: Расширение файла с точкой.
+    :return str: Например ab/cd/abcd...ef.jpg.
+    """
+    return "{0}/{1}/{2}{3}".format(digest[:2], digest[2:4], digest, extension)
+
+
+def media_url(key: str) -> str:
+    """
+    Адрес картинки для фронтенда. Картинки, загруженные до перехода
+    на хранилище по хэшу, лежат в корне и отдаются по прежнему адресу.
+
+    :param key: Путь картинки в хранилище.
+    :return str: Адрес картинки.
+    """
+    return MEDIA_URL_PREFIX + key if "/" in key else key
+
+
+def remove_files(batch: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """
+    Удаляем пачку файлов, выполняется в потоке пула.
+
+    :param batch: Список пар (имя картинки, номер попытки).
+    :return List: Файлы, которые не удалось удалить из-за временной ошибки.
+    """
+    failed: List[Tuple[str, int]] = []
+    for name, attempt in batch:
+        try:
+            os.remove(OUT_PATH / name)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            failed.append((name, attempt))
+    return failed
+
+
+class MediaDeletionQueue:
+    """
+    Queue of pictures to delete from the storage. Files are removed by several
+    workers in batches in a thread pool, so a slow disk does not block the event loop.
+    A file is removed only if it is still unreferenced under the path lock, since
+    an upload of the same picture may have referenced it again after it was queued.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        retries: int,
+        retry_delay: float,
+        session_maker: async_sessionmaker[AsyncSession],
+    ) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.session_maker = session_maker
+        self.deleted: int = 0
+        self.failures: int = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="media-delete",
+        )
+        self._queue: asyncio.Queue[Tuple[str, int]] | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество файлов, ожидающих удаления."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def enqueue(self, images_list: Iterable[str]) -> None:
+        """
+        Ставим картинки в очередь на удаление, не дожидаясь самого удаления.
+
+        :param images_list: Имена картинок.
+        :return None: Ничего не возвращаем.
+        """
+        if self._queue is None:
+            self._start()
+        for name in images_list:
+            self._queue.put_nowait((name, 0))  # type: ignore[union-attr]
+
+    def _start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self) -> None:
+        queue: asyncio.Queue[Tuple[str, int]] = self._queue  # type: ignore[assignment]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, int]] = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                failed = await self._remove(batch)
+            except Exception:
+                logger.exception("Failed to delete a batch of images")
+                failed = batch
+
+            retried: int = 0
+            for name, attempt in failed:
+                if attempt < self.retries:
+                    # Элемент считается незавершенным до повторной постановки в очередь,
+                    # поэтому join дожидается и повторных попыток.
+                    loop.call_later(
+                        self.retry_delay * (attempt + 1),
+                        self._requeue,
+                        (name, attempt + 1),
+                    )
+                    retried += 1
+                else:
+                    self.failures += 1
+                    logger.error("Could not delete image %s", name)
+            for _ in range(len(batch) - retried):
+                queue.task_done()
+
+    async def _remove(self, batch: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        loop = asyncio.get_running_loop()
+        async with self.session_maker() as session:
+            referenced = await lock_media(session, [name for name, _ in batch])
+            orphaned = [item for item in batch if item[0] not in referenced]
+            # Файлы удаляются под блокировкой, она снимается при коммите.
+            failed = await loop.run_in_executor(self._executor, remove_files, orphaned)
+            await session.commit()
+        self.deleted += len(orphaned) - len(failed)
+        return failed
+
+    def _requeue(self, item: Tuple[str, int]) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait(item)
+            self._queue.task_done()
+
+    async def join(self) -> None:
+        """Ждем пока очередь опустеет."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Дожидаемся удаления уже поставленных в очередь файлов и останавливаем воркеры."""
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+media_deletion_queue = MediaDeletionQueue(
+    media_delete_workers,
+    media_delete_batch_size,
+    media_delete_retries,
+    media_delete_retry_delay,
+    async_session_maker,
+)
+
 
 async def remove_images(images_list: List[str]) -> None:
     """
-    Функция для удаления картинок из хранилища.
+    Функция для удаления картинок из хранилища. Картинки ставятся в очередь
+    и удаляются в фоне, поэтому вызывать ее нужно после коммита в бд и только
+    для файлов, на которые не осталось ссылок (release_media).
 
     :param images_list: Список имен картинок которые необходимо удалить.
     :return: None
     """
-    for img in images_list:
-        os.remove(f"{OUT_PATH}/{img}")
+    media_deletion_queue.enqueue(images_list)
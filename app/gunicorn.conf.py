@@ -0,0 +1,59 @@
+"""Gunicorn settings: several uvicorn workers with the application preloaded in the master."""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND") or "0.0.0.0:8000"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# По умолчанию по одному воркеру на ядро, каждому воркеру нужен свой пул соединений
+# с бд, поэтому WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) должно помещаться
+# в max_connections Postgres или PgBouncer.
+workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# Приложение выбирает кэш ленты по количеству воркеров (config.web_concurrency).
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Приложение импортируется один раз в мастере, воркеры получают его через fork.
+preload_app = True
+
+# Плавная замена воркеров: после max_requests запросов (с разбросом, чтобы воркеры
+# не перезапускались одновременно) воркер дорабатывает текущие запросы и завершается.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS") or 10_000)
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER") or 1_000)
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT") or 30)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT") or 60)
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE") or 5)
+
+accesslog = "-"
+errorlog = "-"
+
+
+# Каталог метрик воркеров должен существовать до импорта приложения в мастере.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def on_starting(server) -> None:
+    """Метрики воркеров прошлого запуска не должны попасть в новые."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+            os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
+
+
+def child_exit(server, worker) -> None:
+    """Убираем gauge метрики завершившегося воркера."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker) -> None:
+    """
+    Воркер не должен пользоваться соединениями, открытыми в мастере до fork,
+    поэтому сбрасываем пулы, не закрывая чужие соединения.
+    """
+    from models.db_conf import engine, replica_engines
+
+    for db_engine in [engine, *replica_engines]:
+        db_engine.sync_engine.dispose(close=False)
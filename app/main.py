@@ -2,20 +2,29 @@
 The application initialization and module
 also contains an endpoint for loading images.
 """
-from typing import Dict
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Awaitable, Callable, Dict
 
 from starlette.responses import JSONResponse
 
+from config import counters_reconcile_interval
+from crud.counters import reconcile_counters_periodically
 from crud.user import get_user_by_api_key
-from fastapi import Depends, FastAPI, File, Security, UploadFile
+from crud.utils import media_deletion_queue
+from fastapi import Depends, FastAPI, File, Request, Response, Security, UploadFile
+from fastapi.responses import ORJSONResponse
 from fastapi.security import APIKeyHeader
-from models.db_conf import get_async_session
+from metrics import metrics_middleware, query_budget, render_metrics
+from models.db_conf import STICKY_COOKIE, get_async_session, read_router
+from routes.admin_route import route_admin
 from routes.tweet_route import route_tw
 from routes.user_route import route_us
 from schemas.tweet_schema import ReturnImageSchema, ErrorSchema
 from service import read_and_write_image
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
+from warmup import warm_up
 
 tags_metadata = [
     {
@@ -27,8 +36,26 @@ tags_metadata = [
         "description": "Manage tweets.",
     },
     {"name": "images", "description": "Operations with images"},
+    {"name": "admin", "description": "Service information about the application."},
 ]
 
+
+@asynccontextmanager
+async def lifespan(application: FastAPI) -> AsyncIterator[None]:
+    """Действия при запуске и остановке приложения."""
+    # Воркер начинает принимать запросы только после прогрева.
+    await warm_up()
+    reconcile_task = asyncio.create_task(
+        reconcile_counters_periodically(counters_reconcile_interval)
+    )
+    yield
+    reconcile_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await reconcile_task
+    # Дожидаемся удаления картинок, которые уже стоят в очереди.
+    await media_deletion_queue.stop()
+
+
 app = FastAPI(
     title="TWITTER CLONE",
     description="Корпоративный аналог твиттер",
@@ -40,21 +67,64 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.include_router(route_us)
 app.include_router(route_tw)
+app.include_router(route_admin)
 api_key_header = APIKeyHeader(
     name="api-key",
     auto_error=False,
 )
 
+# Методы, которые не меняют данные и не включают чтение с основного сервера.
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@app.middleware("http")
+async def read_your_writes(
+    request: Request,
+    call_next: Callable[[Request], Awaitable[Response]],
+) -> Response:
+    """
+    После успешной записи пользователь некоторое время читает с основного сервера,
+    чтобы не получить с отстающей реплики данные без своих изменений.
+    """
+    response: Response = await call_next(request)
+    if (
+        read_router.enabled
+        and request.method not in SAFE_METHODS
+        and response.status_code < 400
+    ):
+        primary_until: float = read_router.mark_write(request.headers.get("api-key"))
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(int(primary_until) + 1),
+            max_age=int(read_router.sticky_window) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
+# Добавлен последним, поэтому внешний: в замер попадают и остальные middleware.
+app.middleware("http")(metrics_middleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Метрики приложения в формате Prometheus, nginx наружу их не отдает."""
+    return render_metrics()
+
 
 @app.post(
     "/api/medias",
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(5))],
     response_model=ReturnImageSchema,
-    responses={415: {"model": ErrorSchema}},
+    responses={413: {"model": ErrorSchema}, 415: {"model": ErrorSchema}},
     tags=["images"],
 )
 async def save_image(
@@ -0,0 +1,24 @@
+__all__ = (
+    "CACHE_REQUESTS",
+    "InstrumentedQueuePool",
+    "RequestStats",
+    "UPLOAD_BYTES",
+    "UPLOAD_SIZE",
+    "instrument_engine",
+    "metrics_middleware",
+    "query_budget",
+    "render_metrics",
+    "request_stats",
+    "slow_query_log",
+)
+
+from .budget import query_budget
+from .collectors import CACHE_REQUESTS, UPLOAD_BYTES, UPLOAD_SIZE
+from .database import (
+    InstrumentedQueuePool,
+    RequestStats,
+    instrument_engine,
+    request_stats,
+)
+from .middleware import metrics_middleware, render_metrics
+from .slow_queries import slow_query_log
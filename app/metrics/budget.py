@@ -0,0 +1,22 @@
+"""Declared limits of SQL statements per route."""
+from typing import Awaitable, Callable
+
+from metrics.database import RequestStats, request_stats
+
+
+def query_budget(limit: int) -> Callable[[], Awaitable[None]]:
+    """
+    Зависимость маршрута, которая объявляет, сколько SQL выражений он выполняет
+    в худшем случае (промах кэша аутентификации, все необязательные запросы).
+    Превышение проверяет metrics_middleware.
+
+    :param limit: Допустимое количество выражений на один запрос.
+    :return Callable: Зависимость для dependencies маршрута.
+    """
+
+    async def declare_budget() -> None:
+        stats: RequestStats | None = request_stats.get()
+        if stats is not None:
+            stats.budget = limit
+
+    return declare_budget
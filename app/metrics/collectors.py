@@ -0,0 +1,73 @@
+"""Definitions of the application metrics in the Prometheus format."""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Границы корзин в секундах: от быстрых ответов из кэша до медленных загрузок.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template.",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being processed.",
+    multiprocess_mode="livesum",
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements executed while handling a request.",
+    ("route",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total time of SQL statements executed while handling a request.",
+    ("route",),
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_BUDGET_EXCEEDED = Counter(
+    "db_query_budget_exceeded_total",
+    "Requests that executed more SQL statements than their route declares.",
+    ("route",),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Latency of single SQL statements by operation.",
+    ("operation",),
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+    ("engine",),
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections checked out of the pool.",
+    ("engine",),
+    multiprocess_mode="livesum",
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+
+UPLOAD_BYTES = Counter(
+    "upload_bytes_total",
+    "Bytes of images stored from uploads.",
+)
+UPLOAD_SIZE = Histogram(
+    "upload_size_bytes",
+    "Size of stored images.",
+    buckets=(16_384, 65_536, 262_144, 1_048_576, 4_194_304, 10_485_760),
+)
@@ -0,0 +1,133 @@
+"""SQLAlchemy instrumentation: statement timings, request-scoped counters and pool waits."""
+import time
+from contextvars import ContextVar
+from typing import Any, List, MutableMapping
+
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics.collectors import (
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_IN_USE,
+    DB_QUERY_DURATION,
+)
+from metrics.slow_queries import INSTRUMENT, slow_query_log
+
+OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+class RequestStats:
+    """SQL statements executed while handling the current request."""
+
+    __slots__ = ("queries", "duration", "budget", "scope")
+
+    def __init__(self, scope: MutableMapping[str, Any] | None = None) -> None:
+        self.queries: int = 0
+        self.duration: float = 0.0
+        # Сколько выражений объявил маршрут через query_budget, None - не объявлено.
+        self.budget: int | None = None
+        self.scope: MutableMapping[str, Any] | None = scope
+
+    @property
+    def route(self) -> str | None:
+        """Шаблон маршрута запроса, после роутинга он лежит в scope."""
+        if self.scope is None:
+            return None
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+# SQLAlchemy выполняет события в greenlet с контекстом вызывающей задачи,
+# поэтому запросы попадают в статистику того запроса, который их выполнил.
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def operation_of(statement: str) -> str:
+    """Тип SQL выражения для метки метрики."""
+    word: str = statement.lstrip()[:6].upper()
+    return word if word in OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str = "primary") -> None:
+    """
+    Подписываемся на события движка: время каждого выражения, счетчики текущего
+    запроса, журнал медленных запросов и количество занятых соединений пула.
+
+    :param engine: Синхронный движок, для async движка - engine.sync_engine.
+    :param name: Имя движка в метках метрик.
+    :return None: Ничего не возвращаем.
+    """
+    in_use = DB_POOL_IN_USE.labels(engine=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed: float = time.perf_counter() - conn.info["query_started"].pop()
+        if context is not None and not context.execution_options.get(INSTRUMENT, True):
+            return
+        DB_QUERY_DURATION.labels(operation=operation_of(statement)).observe(elapsed)
+        stats: RequestStats | None = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.duration += elapsed
+        if slow_query_log.enabled:
+            slow_query_log.record(
+                conn.engine,
+                statement,
+                parameters,
+                many,
+                elapsed,
+                stats.route if stats is not None else None,
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        started: List[float] | None = (
+            exception_context.connection.info.get("query_started")
+            if exception_context.connection is not None
+            else None
+        )
+        if started:
+            started.pop()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        in_use.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        in_use.dec()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long a checkout waits for a free connection."""
+
+    _checkout_wait: Histogram
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._checkout_wait = DB_POOL_CHECKOUT_WAIT.labels(engine="primary")
+
+    def label(self, name: str) -> None:
+        """Имя движка в метках метрики ожидания соединения."""
+        self._checkout_wait = DB_POOL_CHECKOUT_WAIT.labels(engine=name)
+
+    def _do_get(self) -> Any:
+        started: float = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._checkout_wait.observe(time.perf_counter() - started)
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # QueuePool.recreate создает новый пул через self.__class__, переносим в него
+        # имя движка, заданное через label.
+        pool = super().recreate()
+        if not isinstance(pool, InstrumentedQueuePool):
+            raise TypeError("Pool was recreated as {0}".format(type(pool).__name__))
+        pool._checkout_wait = self._checkout_wait
+        return pool
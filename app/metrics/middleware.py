@@ -0,0 +1,108 @@
+"""Per-request instrumentation and the /metrics exposition."""
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+
+from config import debug
+from metrics.collectors import (
+    DB_QUERIES_PER_REQUEST,
+    DB_QUERY_BUDGET_EXCEEDED,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+from metrics.database import RequestStats, request_stats
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(request: Request) -> str:
+    """
+    Шаблон пути маршрута вместо самого пути, чтобы id в url не размножали метки.
+
+    :param request: Обработанный запрос.
+    :return str: Например /api/tweets/{tweet_id}/likes или unmatched.
+    """
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+async def metrics_middleware(
+    request: Request,
+    call_next: Callable[[Request], Awaitable[Response]],
+) -> Response:
+    """
+    Замеряем время ответа и запросы к бд для каждого HTTP запроса. Если маршрут
+    выполнил больше SQL выражений, чем объявил в query_budget, пишем предупреждение.
+    В режиме отладки количество выражений отдается в заголовках ответа.
+    """
+    stats = RequestStats(request.scope)
+    token = request_stats.set(stats)
+    started: float = time.perf_counter()
+    status_code: int = 500
+    HTTP_REQUESTS_IN_PROGRESS.inc()
+    try:
+        response: Response = await call_next(request)
+        status_code = response.status_code
+        if debug:
+            set_query_headers(response, stats)
+        return response
+    finally:
+        HTTP_REQUESTS_IN_PROGRESS.dec()
+        route: str = route_template(request)
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            route=route,
+            status=str(status_code),
+        ).observe(time.perf_counter() - started)
+        DB_QUERIES_PER_REQUEST.labels(route=route).observe(stats.queries)
+        DB_TIME_PER_REQUEST.labels(route=route).observe(stats.duration)
+        if stats.budget is not None and stats.queries > stats.budget:
+            DB_QUERY_BUDGET_EXCEEDED.labels(route=route).inc()
+            logger.warning(
+                "%s %s executed %s SQL statements, the budget is %s",
+                request.method,
+                route,
+                stats.queries,
+                stats.budget,
+            )
+        request_stats.reset(token)
+
+
+def set_query_headers(response: Response, stats: RequestStats) -> None:
+    """
+    Заголовки с количеством и временем SQL выражений запроса, по ним видно
+    лишние запросы прямо в инструментах разработчика браузера.
+
+    :param response: Ответ маршрута.
+    :param stats: Статистика запросов к бд.
+    :return None: Ничего не возвращаем.
+    """
+    response.headers["X-Query-Count"] = str(stats.queries)
+    response.headers["X-Query-Time"] = "{0:.2f}".format(stats.duration * 1000)
+    if stats.budget is not None:
+        response.headers["X-Query-Budget"] = str(stats.budget)
+
+
+def render_metrics() -> Response:
+    """
+    Метрики в текстовом формате Prometheus. При нескольких воркерах gunicorn
+    (задан PROMETHEUS_MULTIPROC_DIR) метрики собираются со всех процессов.
+
+    :return Response: Ответ для Prometheus.
+    """
+    registry: CollectorRegistry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,199 @@
+"""In-memory log of slow SQL statements with their execution plans."""
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, List, Set
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import (
+    slow_query_explain_interval,
+    slow_query_explain_timeout,
+    slow_query_log_size,
+    slow_query_sample_rate,
+    slow_query_threshold,
+)
+
+logger = logging.getLogger(__name__)
+
+# Опция выполнения для служебных выражений журнала (EXPLAIN), они не замеряются.
+INSTRUMENT: str = "instrument"
+
+# SELECT, который при повторном выполнении меняет состояние: берет advisory или
+# строковые блокировки, двигает последовательность. Для них снимается только план
+# без ANALYZE, иначе EXPLAIN взял бы ту же блокировку еще раз.
+SIDE_EFFECTS = re.compile(
+    r"\bpg_\w*lock\w*\s*\("
+    r"|\b(nextval|setval)\s*\("
+    r"|\bFOR\s+(NO\s+KEY\s+|KEY\s+)?(UPDATE|SHARE)\b",
+    re.IGNORECASE,
+)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """
+    Типы параметров выражения вместо самих значений, чтобы в журнал
+    не попадали данные пользователей.
+
+    :param parameters: Параметры, переданные драйверу.
+    :return Any: Например ["int", "list[3]"] или {"tweet_id": "int"}.
+    """
+
+    def shape(value: Any) -> str:
+        if isinstance(value, (list, tuple)):
+            return "{0}[{1}]".format(type(value).__name__, len(value))
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return {key: shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [shape(value) for value in parameters]
+    return shape(parameters)
+
+
+class SlowQuery:
+    """A slow statement and, once captured, its plan."""
+
+    __slots__ = ("recorded_at", "duration_ms", "statement", "parameters", "route", "plan")
+
+    def __init__(
+        self,
+        statement: str,
+        parameters: Any,
+        duration: float,
+        route: str | None,
+    ) -> None:
+        self.recorded_at: str = datetime.now(timezone.utc).isoformat()
+        self.duration_ms: float = round(duration * 1000, 2)
+        self.statement: str = statement
+        self.parameters: Any = parameter_shape(parameters)
+        self.route: str | None = route
+        self.plan: str | None = None
+
+    def as_dict(self) -> dict:
+        """Запись в виде словаря для ответа служебного эндпоинта."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SlowQueryLog:
+    """
+    Bounded ring of statements slower than the threshold. Slow statements are
+    sampled, and for SELECT statements EXPLAIN (ANALYZE, BUFFERS) is captured in
+    the background, at most once per explain_interval seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None,
+        sample_rate: float,
+        explain_interval: float,
+        explain_timeout: float,
+        size: int,
+    ) -> None:
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self._entries: Deque[SlowQuery] = deque(maxlen=size)
+        self._last_explain: float = float("-inf")
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        """Включен ли журнал, порог задается переменной SLOW_QUERY_THRESHOLD_MS."""
+        return self.threshold is not None
+
+    def record(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters: Any,
+        many: bool,
+        duration: float,
+        route: str | None,
+    ) -> None:
+        """
+        Запоминаем выражение, если оно медленнее порога и попало в выборку.
+        Вызывается из события движка, поэтому план запрашивается в отдельной задаче.
+
+        :param engine: Движок, на котором выполнялось выражение.
+        :param statement: SQL в том виде, в котором он ушел драйверу.
+        :param parameters: Параметры выражения.
+        :param many: Выполнялось ли выражение для пачки параметров.
+        :param duration: Время выполнения в секундах.
+        :param route: Шаблон маршрута запроса, который выполнил выражение.
+        :return None: Ничего не возвращаем.
+        """
+        if self.threshold is None or duration * 1000 < self.threshold:
+            return
+        if random.random() >= self.sample_rate:
+            return
+
+        entry = SlowQuery(statement, parameters, duration, route)
+        self._entries.append(entry)
+
+        # EXPLAIN ANALYZE выполняет выражение повторно, поэтому только для SELECT.
+        now: float = time.monotonic()
+        if (
+            many
+            or statement.lstrip()[:6].upper() != "SELECT"
+            or now - self._last_explain < self.explain_interval
+        ):
+            return
+        self._last_explain = now
+        analyze: bool = SIDE_EFFECTS.search(statement) is None
+        task = asyncio.get_running_loop().create_task(
+            self._explain(engine, entry, parameters, analyze)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(
+        self,
+        engine: Engine,
+        entry: SlowQuery,
+        parameters: Any,
+        analyze: bool,
+    ) -> None:
+        try:
+            # Транзакция откатывается при выходе, SET LOCAL действует только в ней.
+            async with AsyncEngine(engine).connect() as conn:
+                conn = await conn.execution_options(**{INSTRUMENT: False})
+                # План медленного запроса не должен занимать соединение надолго.
+                await conn.exec_driver_sql(
+                    "SET LOCAL statement_timeout = {0:d}".format(
+                        int(self.explain_timeout * 1000)
+                    )
+                )
+                explain: str = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+                result = await conn.exec_driver_sql(explain + entry.statement, parameters)
+                entry.plan = "\n".join(row[0] for row in result)
+        except Exception:
+            logger.warning("Could not explain a slow statement", exc_info=True)
+
+    def entries(self) -> List[dict]:
+        """Записи журнала, сначала самые новые."""
+        return [entry.as_dict() for entry in reversed(self._entries)]
+
+    def clear(self) -> None:
+        """Очищаем журнал, например после миграции, чтобы видеть только новые планы."""
+        self._entries.clear()
+
+    async def join(self) -> None:
+        """Дожидаемся планов, которые запрашиваются в данный момент."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+slow_query_log = SlowQueryLog(
+    slow_query_threshold,
+    slow_query_sample_rate,
+    slow_query_explain_interval,
+    slow_query_explain_timeout,
+    slow_query_log_size,
+)
@@ -5,7 +5,17 @@ __all__ = (
     "Image",
     "likes_table",
     "followers",
+    "home_timeline",
+    "media_files",
 )
 
 from .db_conf import Base
-from .model import User, Tweet, Image, likes_table, followers
+from .model import (
+    User,
+    Tweet,
+    Image,
+    likes_table,
+    followers,
+    home_timeline,
+    media_files,
+)
@@ -1,9 +1,17 @@
 """We describe the connection to the database."""
-from typing import AsyncGenerator
-
-from config import DB_NAME, DB_PASS, DB_USER
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, List
 
+from config import db_settings
+from fastapi import Request
+from metrics import InstrumentedQueuePool, instrument_engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -12,13 +20,14 @@ from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
-DATABASE_URL: str = "postgresql+asyncpg://{0}:{1}@db/{2}".format(
-    DB_USER,
-    DB_PASS,
-    DB_NAME,
-)
+DATABASE_URL: str = db_settings.url
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    **db_settings.engine_options(),
+)
+instrument_engine(engine.sync_engine)
 async_session_maker = async_sessionmaker(
     bind=engine,
     autoflush=False,
@@ -27,7 +36,180 @@ async_session_maker = async_sessionmaker(
 )
 
 
+replica_engines: List[AsyncEngine] = [
+    create_async_engine(url, poolclass=InstrumentedQueuePool, **db_settings.engine_options())
+    for url in db_settings.replica_urls
+]
+for number, replica_engine in enumerate(replica_engines):
+    replica_pool = replica_engine.sync_engine.pool
+    if isinstance(replica_pool, InstrumentedQueuePool):
+        replica_pool.label("replica-{0}".format(number))
+    instrument_engine(replica_engine.sync_engine, "replica-{0}".format(number))
+replica_session_makers: List[async_sessionmaker[AsyncSession]] = [
+    async_sessionmaker(
+        bind=replica_engine,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False,
+    )
+    for replica_engine in replica_engines
+]
+
+logger = logging.getLogger(__name__)
+
+# Cookie с моментом времени, до которого клиент читает с основного сервера.
+STICKY_COOKIE: str = "read_primary_until"
+# Ключ в session.info, по которому видно, что сессия читает свои же свежие записи.
+READ_YOUR_WRITES: str = "read_your_writes"
+# Ключ в session.info сессий, открытых на реплике.
+READ_REPLICA: str = "read_replica"
+
+
+class ReadRouter:
+    """
+    Chooses a replica for read-only requests. Replicas are used in turn, a replica
+    that could not be connected to is skipped for retry_interval seconds. A user who
+    has just written reads from the primary for sticky_window seconds.
+    """
+
+    def __init__(
+        self,
+        replicas: int,
+        sticky_window: float,
+        retry_interval: float,
+        max_writers: int = 10_000,
+    ) -> None:
+        self.replicas = replicas
+        self.sticky_window = sticky_window
+        self.retry_interval = retry_interval
+        self.max_writers = max_writers
+        self._down_until: List[float] = [0.0] * replicas
+        self._next: int = 0
+        self._writers: OrderedDict[str, float] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """Есть ли реплики для чтения."""
+        return self.replicas > 0
+
+    def candidates(self) -> List[int]:
+        """
+        Номера доступных реплик, начиная со следующей по очереди.
+
+        :return List[int]: Номера реплик в порядке, в котором их стоит пробовать.
+        """
+        now: float = time.monotonic()
+        start: int = self._next
+        self._next = (self._next + 1) % max(self.replicas, 1)
+        order = [(start + shift) % self.replicas for shift in range(self.replicas)]
+        return [index for index in order if self._down_until[index] <= now]
+
+    def mark_down(self, index: int) -> None:
+        """Не обращаемся к реплике retry_interval секунд."""
+        self._down_until[index] = time.monotonic() + self.retry_interval
+
+    def mark_write(self, api_key: str | None) -> float:
+        """
+        Запоминаем, что пользователь только что изменил данные.
+
+        :param api_key: Ключ пользователя.
+        :return float: Unix-время, до которого пользователь читает с основного сервера.
+        """
+        if api_key:
+            self._writers[api_key] = time.monotonic() + self.sticky_window
+            self._writers.move_to_end(api_key)
+            while len(self._writers) > self.max_writers:
+                self._writers.popitem(last=False)
+        return time.time() + self.sticky_window
+
+    def is_sticky(self, api_key: str | None, primary_until: str | None = None) -> bool:
+        """
+        Нужно ли читать с основного сервера, чтобы пользователь увидел свои записи.
+
+        :param api_key: Ключ пользователя.
+        :param primary_until: Значение cookie, выставленной после записи.
+        :return bool: True если пользователь недавно что-то записал.
+        """
+        if primary_until:
+            try:
+                if float(primary_until) > time.time():
+                    return True
+            except ValueError:
+                pass
+        deadline: float | None = self._writers.get(api_key) if api_key else None
+        return deadline is not None and deadline > time.monotonic()
+
+
+read_router = ReadRouter(
+    len(replica_session_makers),
+    db_settings.replica_sticky_window,
+    db_settings.replica_retry_interval,
+)
+
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """Function to get a session."""
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия для запросов, которые только читают данные. Если реплики настроены,
+    сессия открывается на одной из них, при недоступности реплики и сразу после
+    записи пользователя - на основном сервере.
+
+    :param request: Текущий запрос, из него берутся api-key и cookie после записи.
+    :return AsyncGenerator: Сессия для работы с бд.
+    """
+    if read_router.enabled:
+        sticky: bool = read_router.is_sticky(
+            request.headers.get("api-key"),
+            request.cookies.get(STICKY_COOKIE),
+        )
+        if not sticky:
+            for index in read_router.candidates():
+                session: AsyncSession = replica_session_makers[index]()
+                try:
+                    # Подключаемся сразу, чтобы при падении реплики уйти на основной сервер.
+                    await session.connection()
+                except (OSError, SQLAlchemyError, asyncio.TimeoutError):
+                    await session.close()
+                    read_router.mark_down(index)
+                    logger.warning("Read replica %s is unavailable", index)
+                    continue
+                session.info[READ_REPLICA] = True
+                async with session:
+                    yield session
+                return
+
+        async with async_session_maker() as session:
+            session.info[READ_YOUR_WRITES] = sticky
+            yield session
+        return
+
+    async with async_session_maker() as session:
+        yield session
+
+
+def pool_status(async_engine: AsyncEngine = engine) -> dict:
+    """
+    Текущее состояние пула соединений процесса.
+
+    :param async_engine: Движок, чей пул нужно посмотреть.
+    :return dict: Размер пула, количество свободных и занятых соединений и переполнение.
+    """
+    pool = async_engine.sync_engine.pool
+    # Движки приложения создаются с InstrumentedQueuePool, у других пулов нет счетчиков.
+    if not isinstance(pool, QueuePool):
+        raise TypeError("Pool status needs a QueuePool, got {0}".format(type(pool).__name__))
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": db_settings.max_overflow,
+        "timeout": pool.timeout(),
+        "pgbouncer": db_settings.pgbouncer,
+    }
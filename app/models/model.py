@@ -7,6 +7,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
@@ -17,20 +18,41 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 likes_table = Table(
     "likes",
     Base.metadata,
-    Column("user_id", ForeignKey("users.id"), primary_key=True, index=True),
-    Column(
-        "tweet_id",
-        ForeignKey("tweets.tweet_id"),
-        primary_key=True,
-        index=True,
-    ),
+    Column("user_id", ForeignKey("users.id"), primary_key=True),
+    Column("tweet_id", ForeignKey("tweets.tweet_id"), primary_key=True),
 )
 
 followers = Table(
     "followers",
     Base.metadata,
-    Column("follower_id", ForeignKey("users.id"), primary_key=True, index=True),
-    Column("followed_id", ForeignKey("users.id"), primary_key=True, index=True),
+    Column("follower_id", ForeignKey("users.id"), primary_key=True),
+    Column("followed_id", ForeignKey("users.id"), primary_key=True),
+)
+
+# Индекс для постраничной выборки подписчиков пользователя в порядке их id,
+# подписки пользователя в том же порядке отдает первичный ключ.
+Index(
+    "ix_followers_followed_id_follower_id",
+    followers.c.followed_id,
+    followers.c.follower_id,
+)
+
+# Индекс для выборки лайкнувших твит пользователей в порядке их id,
+# лайки пользователя отдает первичный ключ (user_id, tweet_id).
+Index(
+    "ix_likes_tweet_id_user_id",
+    likes_table.c.tweet_id,
+    likes_table.c.user_id,
+)
+
+# Материализованная лента подписок: для каждого пользователя храним твиты тех,
+# на кого он подписан. Лента читается по первичному ключу от новых твитов к старым,
+# счетчик лайков берется из tweets.
+home_timeline = Table(
+    "home_timeline",
+    Base.metadata,
+    Column("user_id", ForeignKey("users.id"), primary_key=True),
+    Column("tweet_id", ForeignKey("tweets.tweet_id"), primary_key=True, index=True),
 )
 
 
@@ -38,24 +60,26 @@ class User(Base):
     """Model User."""
 
     __tablename__ = "users"
-    id: Mapped[int] = mapped_column(
-        Integer,
-        autoincrement=True,
-        primary_key=True,
-        index=True,
-    )
-    api_key: Mapped[str] = mapped_column(String(length=50), unique=True)
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
+    api_key: Mapped[str] = mapped_column(String(length=50))
     name: Mapped[str] = mapped_column(String(length=50))
+    # Счетчики для профиля, меняются вместе с подписками и твитами,
+    # расхождения исправляет периодическая сверка.
+    followers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    following_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    tweets_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Неявная ленивая загрузка связей в обработке запроса дает N+1 запросов,
+    # поэтому связи читаются только с явными опциями загрузки, иначе ошибка.
     likes: Mapped[List["Tweet"]] = relationship(
         secondary=likes_table,
         back_populates="likes",
-        lazy="select",
+        lazy="raise_on_sql",
         cascade="all, delete",
     )
     tweets: Mapped[List["Tweet"]] = relationship(
         "Tweet",
         back_populates="user",
-        lazy="select",
+        lazy="raise_on_sql",
         cascade="all, delete",
     )
     followed: Mapped[List["User"]] = relationship(
@@ -64,7 +88,7 @@ class User(Base):
         primaryjoin=id == followers.c.follower_id,
         secondaryjoin=id == followers.c.followed_id,
         back_populates="follower",
-        lazy="select",
+        lazy="raise_on_sql",
     )
     follower: Mapped[List["User"]] = relationship(
         "User",
@@ -72,48 +96,76 @@ class User(Base):
         primaryjoin=id == followers.c.followed_id,
         secondaryjoin=id == followers.c.follower_id,
         back_populates="followed",
-        lazy="select",
+        lazy="raise_on_sql",
     )
 
 
+# Уникальный ключ аутентификации, id и name лежат в индексе, поэтому проверка
+# api_key на промахе кэша может обойтись без чтения таблицы.
+Index(
+    "ix_users_api_key",
+    User.api_key,
+    unique=True,
+    postgresql_include=["id", "name"],
+)
+
+
 class Tweet(Base):
     """Model tweet."""
 
     __tablename__ = "tweets"
-    tweet_id: Mapped[int] = mapped_column(
-        Integer,
-        autoincrement=True,
-        primary_key=True,
-        index=True,
-    )
+    tweet_id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
     tweet_data: Mapped[str] = mapped_column(String(length=10000))
     tweet_media_ids: Mapped[List[str]] = mapped_column(
         ARRAY(String(200)),
         nullable=True,
     )
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
-    user: Mapped[List["User"]] = relationship(
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user: Mapped["User"] = relationship(
         User,
         back_populates="tweets",
-        lazy="joined",
+        lazy="raise_on_sql",
     )
     likes: Mapped[List["User"]] = relationship(
         User,
         secondary=likes_table,
         back_populates="likes",
-        lazy="joined",
+        lazy="raise_on_sql",
     )
+    likes_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     time_created = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# Индекс под ленту: твиты отсортированы по количеству лайков, tweet_id - для стабильного порядка.
+Index(
+    "ix_tweets_likes_count_tweet_id",
+    Tweet.likes_count.desc(),
+    Tweet.tweet_id.desc(),
+)
+
+# Твиты автора от новых к старым: добавление в ленту при подписке, удаление
+# из ленты при отписке и подсчет твитов читают только этот индекс.
+Index(
+    "ix_tweets_user_id_tweet_id",
+    Tweet.user_id,
+    Tweet.tweet_id.desc(),
+)
+
+
+# Файлы картинок в хранилище: имя файла получено из хэша содержимого, поэтому
+# одинаковые картинки хранятся один раз. refcount - сколько загрузок и твитов
+# ссылаются на файл, файл удаляется вместе с последней ссылкой.
+media_files = Table(
+    "media_files",
+    Base.metadata,
+    Column("key", String(200), primary_key=True),
+    Column("refcount", Integer, nullable=False, server_default="0"),
+)
+
+
 class Image(Base):
     """Model images."""
 
     __tablename__ = "images"
-    id: Mapped[int] = mapped_column(
-        Integer,
-        autoincrement=True,
-        primary_key=True,
-        index=True,
-    )
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
     url: Mapped[str] = mapped_column(String(length=200))
@@ -0,0 +1,98 @@
+"""We describe service routes for inspecting the running application."""
+import secrets
+
+from fastapi import APIRouter, HTTPException, Security
+from fastapi.security import APIKeyHeader
+from starlette import status
+
+from config import ADMIN_API_KEY
+from metrics import slow_query_log
+from models.db_conf import pool_status
+from schemas.admin_schema import ReturnPoolStatusSchema, ReturnSlowQueriesSchema
+from schemas.tweet_schema import ErrorResponse, SuccessSchema
+
+route_admin = APIRouter(prefix="/api/admin")
+admin_key_header = APIKeyHeader(name="admin-key", auto_error=False)
+
+
+def verify_admin_key(admin_key: str | None = Security(admin_key_header)) -> None:
+    """
+    Проверяем ключ администратора. Если ADMIN_API_KEY не задан, служебные
+    эндпоинты отключены и отвечают 404.
+
+    :param admin_key: Ключ из заголовка admin-key.
+    :return None: Ничего не возвращаем, при неверном ключе пробрасываем исключение.
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "result": False,
+                "error_type": "Not Found",
+                "error_message": "Not Found",
+            },
+        )
+    if admin_key is None or not secrets.compare_digest(admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "result": False,
+                "error_type": "Forbidden",
+                "error_message": "Invalid admin key.",
+            },
+        )
+
+
+@route_admin.get(
+    "/pool",
+    status_code=status.HTTP_200_OK,
+    response_model=ReturnPoolStatusSchema,
+    responses={403: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["admin"],
+)
+async def get_pool_status(_: None = Security(verify_admin_key)) -> dict:
+    """
+    Состояние пула соединений с бд в воркере, который обработал запрос.
+
+    :return Dict: Возвращаем размер пула и количество занятых соединений.
+    """
+    return {"result": True, "pool": pool_status()}
+
+
+@route_admin.get(
+    "/slow-queries",
+    status_code=status.HTTP_200_OK,
+    response_model=ReturnSlowQueriesSchema,
+    responses={403: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["admin"],
+)
+async def get_slow_queries(_: None = Security(verify_admin_key)) -> dict:
+    """
+    Журнал медленных запросов воркера, который обработал запрос, вместе с планами.
+    Журнал включается переменной SLOW_QUERY_THRESHOLD_MS.
+
+    :return Dict: Возвращаем порог и записи журнала, сначала самые новые.
+    """
+    return {
+        "result": True,
+        "threshold_ms": slow_query_log.threshold,
+        "queries": slow_query_log.entries(),
+    }
+
+
+@route_admin.delete(
+    "/slow-queries",
+    status_code=status.HTTP_200_OK,
+    response_model=SuccessSchema,
+    responses={403: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["admin"],
+)
+async def clear_slow_queries(_: None = Security(verify_admin_key)) -> dict:
+    """
+    Очищаем журнал медленных запросов, например после миграции, чтобы видеть
+    только планы, построенные после нее.
+
+    :return Dict: Возвращаем результат.
+    """
+    slow_query_log.clear()
+    return {"result": True}
@@ -3,6 +3,13 @@ from typing import Dict
 
 from starlette import status
 
+from cache import UserIdentity
+from config import (
+    max_number_of_likes,
+    max_number_of_tweets,
+    number_of_likes,
+    number_of_tweets,
+)
 from crud.tweet import (
     add_like_in_db,
     add_tweet_in_db,
@@ -11,20 +18,29 @@ from crud.tweet import (
     get_tweet_by_id,
 )
 from crud.user import get_user_by_api_key
-from fastapi import APIRouter, Depends, Security, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Query,
+    Security,
+    HTTPException,
+)
 from fastapi.security import APIKeyHeader
-from models.db_conf import get_async_session
-from models.model import Tweet, User
+from metrics import query_budget
+from models.db_conf import get_async_session, get_read_session
+from models.model import Tweet
 from schemas.tweet_schema import (
     AddTweetSchema,
+    ListLikesSchema,
     ListTweetSchema,
     ReturnAddTweetSchema,
     SuccessSchema,
     ErrorResponse,
 )
-from service import tweet_constructor
+from service import get_feed, likes_constructor
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 route_tw = APIRouter(prefix="/api")
 api_key_header = APIKeyHeader(name="api-key", auto_error=False)
@@ -33,34 +49,43 @@ api_key_header = APIKeyHeader(name="api-key", auto_error=False)
 @route_tw.get(
     "/tweets",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(4))],
     response_model=ListTweetSchema,
+    responses={400: {"model": ErrorResponse}},
     tags=["tweets"],
 )
 async def get_all_tweets(
+    cursor: str | None = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(number_of_tweets, ge=1, le=max_number_of_tweets),
     api_key: str = Security(api_key_header),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
+    session: AsyncSession = Depends(get_read_session),
+) -> Response:
     """
     Функция проверяет если пользователь в базе с пришедшим в header api_key, и если есть
     то отправляет на формирование списка твитов для отправки на frontend.
 
+    :param cursor: Курсор для получения следующей страницы.
+    :param limit: Количество твитов на странице.
     :param api_key: Ключ для аутентификации пользователя.
     :param session: Сессия для работы с бд.
-    :return Dict: Возвращает словарь с нужными данными.
+    :return Response: Возвращает уже сериализованный список твитов.
     """
     user = await get_user_by_api_key(session, api_key)
-    return await tweet_constructor(session, user.id)
+    body: bytes = await get_feed(session, user.id, cursor, limit)
+    return Response(content=body, media_type="application/json")
 
 
 @route_tw.post(
     "/tweets",
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(6))],
     response_model=ReturnAddTweetSchema,
     responses={400: {"model": ErrorResponse}},
     tags=["tweets"]
 )
 async def add_tweets(
     tweet_in: AddTweetSchema,
+    background_tasks: BackgroundTasks,
     api_key: str = Security(api_key_header),
     session: AsyncSession = Depends(get_async_session),
 ) -> Dict[str, int] | JSONResponse:
@@ -69,18 +94,20 @@ async def add_tweets(
     то отправляет на сохранение твита.
 
     :param tweet_in: Пришедшие с frontend данные для твита.
+    :param background_tasks: Фоновые задачи, нужны для раскладки твита по лентам.
     :param api_key: Ключ для аутентификации пользователя.
     :param session: Сессия для работы с бд.
     :return Dict: Возвращает словарь с идентификатором сохраненного твита.
     """
-    user: User = await get_user_by_api_key(session, api_key)
-    tweet: int = await add_tweet_in_db(session, user, tweet_in)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
+    tweet: int = await add_tweet_in_db(session, user, tweet_in, background_tasks)
     return {"result": True, "tweet_id": tweet}
 
 
 @route_tw.delete(
     "/tweets/{tweet_id}",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(8))],
     response_model=SuccessSchema,
     responses={403: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
     tags=["tweets"],
@@ -100,7 +127,7 @@ async def delete_tweet(
     :return Dict: Возвращает словарь с результатом удаления твита.
     """
 
-    user: User = await get_user_by_api_key(session, api_key)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
     tweet: Tweet = await get_tweet_by_id(session, tweet_id)
 
     # Проверяем есть ли у пользователя право на удаление данного твита.
@@ -117,9 +144,40 @@ async def delete_tweet(
     return {"result": True}
 
 
+@route_tw.get(
+    "/tweets/{tweet_id}/likes",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(3))],
+    response_model=ListLikesSchema,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["tweets"],
+)
+async def get_likes(
+    tweet_id: int,
+    cursor: str | None = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(number_of_likes, ge=1, le=max_number_of_likes),
+    api_key: str = Security(api_key_header),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    """
+    Функция проверяет если пользователь в базе с пришедшим в header api_key, и если есть
+    то возвращает страницу со списком пользователей, лайкнувших твит.
+
+    :param tweet_id: Идентификатор твита.
+    :param cursor: Курсор для получения следующей страницы.
+    :param limit: Количество пользователей на странице.
+    :param api_key: Ключ для аутентификации пользователя.
+    :param session: Сессия для работы с бд.
+    :return Dict: Возвращает словарь со списком пользователей.
+    """
+    await get_user_by_api_key(session, api_key)
+    return await likes_constructor(session, tweet_id, cursor, limit)
+
+
 @route_tw.post(
     "/tweets/{tweet_id}/likes",
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(4))],
     response_model=SuccessSchema,
     responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
     tags=["tweets"],
@@ -140,15 +198,15 @@ async def add_likes(
     :return Dict: Возвращает словарь с результатом добавления лайка.
     """
 
-    user: User = await get_user_by_api_key(session, api_key)
-    tweet: Tweet = await get_tweet_by_id(session, tweet_id)
-    await add_like_in_db(session, tweet, user)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
+    await add_like_in_db(session, tweet_id, user)
     return {"result": True}
 
 
 @route_tw.delete(
     "/tweets/{tweet_id}/likes",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(4))],
     response_model=SuccessSchema,
     responses={404: {"model": ErrorResponse}},
     tags=["tweets"],
@@ -169,7 +227,6 @@ async def delete_likes(
     :return Dict: Возвращает словарь с результатом удаления лайка.
     """
 
-    user: User = await get_user_by_api_key(session, api_key)
-    tweet: Tweet = await get_tweet_by_id(session, tweet_id)
-    await delete_like_in_db(session, tweet, user)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
+    await delete_like_in_db(session, tweet_id, user)
     return {"result": True}
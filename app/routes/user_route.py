@@ -1,21 +1,27 @@
 """We describe routes for requests related to users."""
 from typing import Dict
 
+from fastapi.responses import ORJSONResponse
 from starlette.responses import JSONResponse
 
+from cache import UserIdentity
+from config import max_number_of_follows, number_of_follows
+from crud.records import UserProfile
 from crud.user import (
     add_followed,
+    get_followers,
+    get_following,
     get_user_by_api_key,
-    get_user_by_id,
+    get_user_profile,
     remove_followed,
 )
-from fastapi import APIRouter, Depends, Security, HTTPException
+from fastapi import APIRouter, Depends, Query, Security, HTTPException
 from fastapi.security import APIKeyHeader
-from models.db_conf import get_async_session
-from models.model import User
+from metrics import query_budget
+from models.db_conf import get_async_session, get_read_session
 from schemas.tweet_schema import SuccessSchema, ErrorResponse
-from schemas.user_schema import ReturnUserSchema
-from service import get_user_info
+from schemas.user_schema import ListUsersSchema, ReturnUserSchema
+from service import follows_constructor, get_user_info
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
@@ -26,30 +32,34 @@ api_key_header = APIKeyHeader(name="api-key", auto_error=False)
 @route_us.get(
     "/me",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(2))],
     response_model=ReturnUserSchema,
     responses={404: {"model": ErrorResponse}},
     tags=["users"]
 )
 async def get_user_info_by_api_key(
     api_key: str = Security(api_key_header),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
+    session: AsyncSession = Depends(get_read_session),
+) -> ORJSONResponse:
     """
     Получение информации о текущем пользователе, по его api_key.
 
     :param api_key: Ключ для аутентификации пользователя.
     :param session: Сессия для работы с бд.
-    :return Dict: Возвращаем словарь с нужной информацией. Если пользователя не найдено
-    пробрасываем исключение.
+    :return ORJSONResponse: Возвращаем ответ с нужной информацией. Если пользователя
+    не найдено пробрасываем исключение.
     """
 
-    user: User = await get_user_by_api_key(session, api_key)
-    return await get_user_info(session, user)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
+    me: UserProfile = await get_user_profile(session, user.id)
+    # Ответ собран из простых типов, поэтому отдаем его без повторной валидации.
+    return ORJSONResponse(await get_user_info(session, me))
 
 
 @route_us.get(
     "/{user_id}",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(3))],
     response_model=ReturnUserSchema,
     responses={404: {"model": ErrorResponse}, 400: {"model": ErrorResponse}},
     tags=["users"],
@@ -57,8 +67,8 @@ async def get_user_info_by_api_key(
 async def get_user_info_by_id(
     user_id: int,
     api_key: str = Security(api_key_header),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict | JSONResponse:
+    session: AsyncSession = Depends(get_read_session),
+) -> ORJSONResponse:
     """
     Функция проверяет есть ли пользователь с пришедшим api_key,
     если да то проверяет есть ли пользователь с пришедшим ID, если да то
@@ -68,18 +78,79 @@ async def get_user_info_by_id(
     :param user_id: ID пользователя о котором нужно собрать информацию.
     :param api_key: Ключ для аутентификации текущего пользователя.
     :param session: Сессия для работы с бд.
-    :return Dict: Возвращаем в случае успеха словарь с информацией о пользователе.
+    :return ORJSONResponse: Возвращаем в случае успеха ответ с информацией о пользователе.
     """
 
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
+
+    search_user: UserProfile = await get_user_profile(session, user_id)
+    return ORJSONResponse(await get_user_info(session, search_user, user.id))
+
+
+@route_us.get(
+    "/{user_id}/followers",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(3))],
+    response_model=ListUsersSchema,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["users"],
+)
+async def get_user_followers(
+    user_id: int,
+    cursor: str | None = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(number_of_follows, ge=1, le=max_number_of_follows),
+    api_key: str = Security(api_key_header),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    """
+    Функция проверяет есть ли пользователь с пришедшим api_key, и если есть
+    то возвращает страницу со списком подписчиков пользователя с пришедшим ID.
+
+    :param user_id: ID пользователя, чьих подписчиков нужно получить.
+    :param cursor: Курсор для получения следующей страницы.
+    :param limit: Количество пользователей на странице.
+    :param api_key: Ключ для аутентификации текущего пользователя.
+    :param session: Сессия для работы с бд.
+    :return Dict: Возвращает словарь со списком пользователей.
+    """
     await get_user_by_api_key(session, api_key)
+    return await follows_constructor(session, user_id, get_followers, cursor, limit)
+
 
-    search_user: User = await get_user_by_id(session, user_id)
-    return await get_user_info(session, search_user)
+@route_us.get(
+    "/{user_id}/following",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(3))],
+    response_model=ListUsersSchema,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+    tags=["users"],
+)
+async def get_user_following(
+    user_id: int,
+    cursor: str | None = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(number_of_follows, ge=1, le=max_number_of_follows),
+    api_key: str = Security(api_key_header),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    """
+    Функция проверяет есть ли пользователь с пришедшим api_key, и если есть
+    то возвращает страницу со списком подписок пользователя с пришедшим ID.
+
+    :param user_id: ID пользователя, чьи подписки нужно получить.
+    :param cursor: Курсор для получения следующей страницы.
+    :param limit: Количество пользователей на странице.
+    :param api_key: Ключ для аутентификации текущего пользователя.
+    :param session: Сессия для работы с бд.
+    :return Dict: Возвращает словарь со списком пользователей.
+    """
+    await get_user_by_api_key(session, api_key)
+    return await follows_constructor(session, user_id, get_following, cursor, limit)
 
 
 @route_us.delete(
     "/{user_id}/follow",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(4))],
     response_model=SuccessSchema,
     responses={404: {"model": ErrorResponse}},
     tags=["users"],
@@ -100,16 +171,16 @@ async def remove_follow(
     :param session: Сессия для работы с бд.
     :return Dict: Возвращаем в случае успеха словарь с результатом работы.
     """
-    user: User = await get_user_by_api_key(session, api_key)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
 
-    user_followed: User = await get_user_by_id(session, user_id)
-    await remove_followed(session, user.id, user_followed)
+    await remove_followed(session, user.id, user_id)
     return {"result": True}
 
 
 @route_us.post(
     "/{user_id}/follow",
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(4))],
     response_model=SuccessSchema,
     responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
     tags=["users"],
@@ -131,7 +202,7 @@ async def add_follow(
     :return Dict: Возвращаем в случае успеха словарь с результатом работы.
     """
 
-    user: User = await get_user_by_api_key(session, api_key)
+    user: UserIdentity = await get_user_by_api_key(session, api_key)
     if user_id == user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,6 +213,5 @@ async def add_follow(
             }
         )
 
-    user_followed: User = await get_user_by_id(session, user_id)
-    await add_followed(session, user.id, user_followed)
+    await add_followed(session, user.id, user_id)
     return {"result": True}
@@ -0,0 +1,43 @@
+"""Schemes for the service endpoints of the application."""
+from typing import Any, List
+
+from pydantic import BaseModel, Field
+
+
+class PoolStatusSchema(BaseModel):
+    """Schema for the state of the database connection pool."""
+
+    pool_class: str = Field(..., description="Pool implementation")
+    size: int = Field(..., description="Configured number of persistent connections")
+    checked_in: int = Field(..., description="Idle connections in the pool")
+    checked_out: int = Field(..., description="Connections in use")
+    overflow: int = Field(..., description="Current overflow, negative until filled")
+    max_overflow: int = Field(..., description="Allowed overflow connections")
+    timeout: float = Field(..., description="Seconds to wait for a free connection")
+    pgbouncer: bool = Field(..., description="Whether PgBouncer mode is enabled")
+
+
+class ReturnPoolStatusSchema(BaseModel):
+    """A schema for returning the result and the pool state."""
+
+    result: bool = Field(..., description="Result, true or false")
+    pool: PoolStatusSchema = Field(..., description="Pool state of this worker")
+
+
+class SlowQuerySchema(BaseModel):
+    """Schema for a statement of the slow query log."""
+
+    recorded_at: str = Field(..., description="When the statement finished, UTC")
+    duration_ms: float = Field(..., description="Execution time in milliseconds")
+    statement: str = Field(..., description="SQL text as sent to the driver")
+    parameters: Any = Field(..., description="Types of the bound parameters")
+    route: str | None = Field(..., description="Route template of the request")
+    plan: str | None = Field(..., description="EXPLAIN (ANALYZE, BUFFERS) output")
+
+
+class ReturnSlowQueriesSchema(BaseModel):
+    """A schema for returning the slow query log of the worker."""
+
+    result: bool = Field(..., description="Result, true or false")
+    threshold_ms: float | None = Field(..., description="Threshold, null if disabled")
+    queries: List[SlowQuerySchema] = Field(..., description="Newest statements first")
@@ -66,8 +66,11 @@ class TweetSchema(BaseModel):
     author: UserSchema = Field(..., description="User object")
     likes: List[UserSchemaLikes] = Field(
         ...,
-        description="List of app_users who liked it",
+        description="A few app_users who liked it, "
+                    "the full list is available at /api/tweets/{id}/likes",
     )
+    likes_count: int = Field(..., description="Number of likes")
+    liked_by_me: bool = Field(False, description="Whether the current user liked it")
 
 
 class ListTweetSchema(BaseModel):
@@ -75,3 +78,18 @@ class ListTweetSchema(BaseModel):
 
     result: bool = Field(..., description="Result, true or false")
     tweets: List[TweetSchema] = Field(..., description="List tweets")
+    next_cursor: str | None = Field(
+        None,
+        description="Cursor for the next page, null if this is the last page",
+    )
+
+
+class ListLikesSchema(BaseModel):
+    """Circuit for returning a page of users who liked a tweet."""
+
+    result: bool = Field(..., description="Result, true or false")
+    likes: List[UserSchemaLikes] = Field(..., description="Users who liked the tweet")
+    next_cursor: str | None = Field(
+        None,
+        description="Cursor for the next page, null if this is the last page",
+    )
@@ -28,13 +28,12 @@ class UserSchemaFull(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int = Field(..., description="User ID")
     name: str = Field(..., description="User name")
-    following: List[UserSchema] = Field(
-        ...,
-        description="List following",
-    )
-    followers: List[UserSchema] = Field(
-        ...,
-        description="List followers",
+    following_count: int = Field(..., description="Number of following")
+    followers_count: int = Field(..., description="Number of followers")
+    tweets_count: int = Field(..., description="Number of tweets")
+    is_followed: bool = Field(
+        False,
+        description="Whether the current user follows this user",
     )
 
 
@@ -44,3 +43,14 @@ class ReturnUserSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     result: bool = Field(..., description="Result, true or false")
     user: UserSchemaFull = Field(..., description="User object")
+
+
+class ListUsersSchema(BaseModel):
+    """A schema for returning a page of followers or following."""
+
+    result: bool = Field(..., description="Result, true or false")
+    users: List[UserSchema] = Field(..., description="List users")
+    next_cursor: str | None = Field(
+        None,
+        description="Cursor for the next page, null if this is the last page",
+    )
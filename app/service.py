@@ -1,36 +1,143 @@
 """A module for working with data, such as saving pictures and generating a response to the user."""
-import random
+import hashlib
+from contextlib import suppress
 from pathlib import Path
-from string import ascii_letters, digits
-from typing import Sequence
+from typing import Awaitable, Callable, List, Sequence, Set, Tuple
+from uuid import uuid4
 
 import aiofiles
+import aiofiles.os
+import orjson
 from starlette import status
 
-from config import allowed_types
-from crud.tweet import get_all_tweet_followed
-from crud.user import get_full_user_data
+from cache import feed_cache
+from config import (
+    allowed_types,
+    max_image_size,
+    number_of_follows,
+    number_of_likes,
+    number_of_tweets,
+    tweet_followers,
+    upload_chunk_size,
+)
+from crud.image import add_media_reference, lock_media
+from crud.pagination import decode_cursor, encode_cursor
+from crud.tweet import (
+    get_all_tweet_followed,
+    get_liked_tweet_ids,
+    get_likes_sample,
+    get_tweet_likes,
+)
+from crud.user import is_following
+from crud.utils import media_key, media_url
 from fastapi import UploadFile, HTTPException
-from models.model import Image, User, Tweet
+from metrics import UPLOAD_BYTES, UPLOAD_SIZE
+from models.db_conf import READ_REPLICA, READ_YOUR_WRITES
+from crud.records import FeedTweet, UserProfile
+from models.model import Image
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 OUT_PATH = Path(__file__).parent / "./dist/images/"
 OUT_PATH.mkdir(exist_ok=True, parents=True)
 OUT_PATH = OUT_PATH.absolute()
 
+# Сигнатуры начала файлов jpeg и png и расширения, под которыми они хранятся,
+# webp проверяется отдельно.
+IMAGE_SIGNATURES = ((b"\xff\xd8\xff", ".jpg"), (b"\x89PNG\r\n\x1a\n", ".png"))
 
-async def generate_sequence() -> str:
+
+def image_extension(header: bytes) -> str | None:
+    """
+    Определяем по сигнатуре начала файла формат картинки.
+
+    :param header: Первые байты файла.
+    :return str | None: Расширение для jpeg, png или webp, None если это не картинка
+    допустимого формата.
+    """
+    if header[8:12] == b"WEBP":
+        return ".webp" if header.startswith(b"RIFF") else None
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+async def save_upload(img: UploadFile) -> Tuple[str, Path]:
+    """
+    Функция по частям копирует загруженный файл во временный файл хранилища,
+    попутно считая sha256 содержимого. В хранилище файл переносит add_image_in_db
+    после того, как возьмет ссылку на него. В памяти одновременно находится
+    не больше одного блока upload_chunk_size.
+
+    :param img: Картинка из формы.
+    :return Tuple: Путь картинки в хранилище по хэшу и временный файл, если файл
+    не картинка или слишком большой пробрасываем исключение.
     """
-    Генерируем последовательность символов для добавления к картинке.
+    temp_location: Path = OUT_PATH / "{0}.part".format(uuid4().hex)
+    digest = hashlib.sha256()
+    size: int = 0
+    try:
+        async with aiofiles.open(temp_location, "wb") as file_object:
+            chunk: bytes = await img.read(upload_chunk_size)
+            extension: str | None = image_extension(chunk)
+            if extension is None:
+                raise unsupported_media_type()
+
+            while chunk:
+                size += len(chunk)
+                if size > max_image_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail={
+                            "result": False,
+                            "error_type": "REQUEST_ENTITY_TOO_LARGE",
+                            "error_message": "File is too large",
+                        },
+                    )
+                digest.update(chunk)
+                await file_object.write(chunk)
+                chunk = await img.read(upload_chunk_size)
+
+        return media_key(digest.hexdigest(), extension), temp_location
+    except BaseException:
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(temp_location)
+        raise
+
+
+def unsupported_media_type() -> HTTPException:
+    """Ошибка для файлов, которые не являются картинкой допустимого формата."""
+    return HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail={
+            "result": False,
+            "error_type": "UNSUPPORTED_MEDIA_TYPE",
+            "error_message": "File type not supported",
+        },
+    )
+
 
-    :return str: Возвращает строку из символов.
+async def store_file(temp_location: Path, key: str) -> None:
     """
+    Переносим временный файл в хранилище. Файл заменяется, даже если картинка
+    с таким хэшем уже есть: содержимое у них одинаковое, а прежний файл мог
+    в этот момент удаляться вместе с последним твитом, который на него ссылался.
 
-    sequence: str = ""
-    for index in range(5):
-        sequence += random.choice(ascii_letters)
-        sequence += random.choice(digits)
-    return sequence
+    :param temp_location: Временный файл загрузки.
+    :param key: Путь картинки в хранилище.
+    :return None: Ничего не возвращаем.
+    """
+    file_location: Path = OUT_PATH / key
+    created: bool = not await aiofiles.os.path.exists(file_location)
+    size: int = (await aiofiles.os.stat(temp_location)).st_size
+    await aiofiles.os.makedirs(file_location.parent, exist_ok=True)
+    # Переименование в пределах одной файловой системы атомарно, поэтому
+    # nginx никогда не отдаст недописанную картинку.
+    await aiofiles.os.replace(temp_location, file_location)
+    if created:
+        UPLOAD_BYTES.inc(size)
+        UPLOAD_SIZE.observe(size)
 
 
 async def read_and_write_image(
@@ -47,33 +154,23 @@ async def read_and_write_image(
 
     # Проверяем допустимый ли формат картинки.
     if img.content_type in allowed_types:
-        file_name: str = (
-            await generate_sequence() + img.filename
-            if isinstance(img.filename, str)
-            else ".png"
-        )
-        file_location = "{0}/{1}".format(OUT_PATH, file_name)
+        key, temp_location = await save_upload(img)
+        try:
+            # Отправляем на сохранение в бд пути картинки в хранилище.
+            return await add_image_in_db(session, key, temp_location)
+        finally:
+            # После переноса в хранилище временного файла уже нет.
+            with suppress(FileNotFoundError):
+                await aiofiles.os.remove(temp_location)
 
-        file_read = await img.read()
-        async with aiofiles.open(file_location, "wb") as file_object:
-            await file_object.write(file_read)
-
-        # Отправляем на сохранение в бд имени картинки.
-        return await add_image_in_db(session, file_name)
-
-    raise HTTPException(
-        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-        detail={
-            "result": False,
-            "error_type": "UNSUPPORTED_MEDIA_TYPE",
-            "error_message": "File type not supported",
-        },
-    )
+    raise unsupported_media_type()
 
 
 async def tweet_constructor(
     session: AsyncSession,
-    user_id: int
+    user_id: int,
+    cursor: str | None = None,
+    limit: int = number_of_tweets,
 ) -> dict:
     """
     Формируем правильную структуры с твитами для отправки на фронтенд.
@@ -81,64 +178,200 @@ async def tweet_constructor(
     :param session: Сессия для работы с бд.
     :param user_id: Идентификатор пользователя,
     нужен если будет сортировка твитов от подписчиков.
-    :return dict: Возвращаем данные в виде словаря.
+    :param cursor: Курсор из ответа на предыдущую страницу.
+    :param limit: Количество твитов на странице.
+    :return dict: Возвращаем данные в виде словаря из простых типов, который можно
+    сразу сериализовать без валидации через pydantic.
     """
     tweet_list = []
-    tweets: Sequence[Tweet] = await get_all_tweet_followed(session, user_id)
+    # Общая лента идет по ключу (likes_count, tweet_id), лента подписок по tweet_id.
+    key_size: int = 1 if tweet_followers else 2
+    after: Tuple[int, ...] | None = decode_cursor(cursor, key_size) if cursor else None
+
+    # Запрашиваем на один твит больше, чтобы понять есть ли следующая страница.
+    tweets: List[FeedTweet] = await get_all_tweet_followed(
+        session, user_id, after, limit + 1
+    )
+    next_cursor: str | None = None
+    if len(tweets) > limit:
+        tweets = tweets[:limit]
+        last: FeedTweet = tweets[-1]
+        next_cursor = (
+            encode_cursor(last.tweet_id)
+            if tweet_followers
+            else encode_cursor(last.likes_count, last.tweet_id)
+        )
+
+    # Вместо полного списка лайкнувших отдаем счетчик и несколько пользователей,
+    # их выборка для всей страницы делается одним запросом.
+    likes_sample = await get_likes_sample(session, [tweet.tweet_id for tweet in tweets])
     for tweet in tweets:
         tweet_data = {
             "id": tweet.tweet_id,
-            "content": tweet.tweet_data,
-            "attachments": tweet.tweet_media_ids,
-            "author": tweet.user,
-            "likes": [{"user_id": usr.id, "name": usr.name} for usr in tweet.likes],
+            "content": tweet.content,
+            "attachments": [media_url(key) for key in tweet.attachments or []],
+            "author": {"id": tweet.author_id, "name": tweet.author_name},
+            "likes": likes_sample.get(tweet.tweet_id, []),
+            "likes_count": tweet.likes_count,
+            "liked_by_me": False,
         }
         tweet_list.append(tweet_data)
-    return {"result": True, "tweets": tweet_list}
+    return {"result": True, "tweets": tweet_list, "next_cursor": next_cursor}
+
+
+async def get_feed(
+    session: AsyncSession,
+    user_id: int,
+    cursor: str | None = None,
+    limit: int = number_of_tweets,
+) -> bytes:
+    """
+    Отдаем страницу ленты в виде готового JSON. Общая лента одинакова для всех
+    пользователей, поэтому собирается один раз и берется из кэша до ближайшей записи.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: Идентификатор пользователя.
+    :param cursor: Курсор из ответа на предыдущую страницу.
+    :param limit: Количество твитов на странице.
+    :return bytes: Сериализованный ответ.
+    """
+    scope: str = "followers:{0}".format(user_id) if tweet_followers else "global"
+    generation, body = await feed_cache.get(scope, cursor, limit)
+    # Сразу после записи пользователь читает с основного сервера мимо кэша, иначе
+    # страница, собранная на отстающей реплике, скрыла бы его изменения.
+    if body is None or session.info.get(READ_YOUR_WRITES):
+        feed: dict = await tweet_constructor(session, user_id, cursor, limit)
+        body = orjson.dumps(feed)
+        await feed_cache.set(
+            generation,
+            scope,
+            cursor,
+            limit,
+            body,
+            from_replica=session.info.get(READ_REPLICA, False),
+        )
+
+    # Отметка о лайке своя у каждого пользователя, поэтому не хранится в кэше,
+    # а проставляется поверх кэшированной страницы.
+    page: dict = orjson.loads(body)
+    tweet_ids: List[int] = [tweet["id"] for tweet in page["tweets"]]
+    liked: Set[int] = await get_liked_tweet_ids(session, user_id, tweet_ids)
+    if not liked:
+        return body
+    for tweet in page["tweets"]:
+        tweet["liked_by_me"] = tweet["id"] in liked
+    return orjson.dumps(page)
+
+
+async def likes_constructor(
+    session: AsyncSession,
+    tweet_id: int,
+    cursor: str | None = None,
+    limit: int = number_of_likes,
+) -> dict:
+    """
+    Формируем страницу со списком пользователей, лайкнувших твит.
+
+    :param session: Сессия для работы с бд.
+    :param tweet_id: Идентификатор твита.
+    :param cursor: Курсор из ответа на предыдущую страницу.
+    :param limit: Количество пользователей на странице.
+    :return dict: Возвращаем данные в виде словаря.
+    """
+    after: int | None = decode_cursor(cursor, 1)[0] if cursor else None
+    likes: Sequence[Row] = await get_tweet_likes(session, tweet_id, after, limit + 1)
+
+    next_cursor: str | None = None
+    if len(likes) > limit:
+        likes = likes[:limit]
+        next_cursor = encode_cursor(likes[-1].user_id)
+
+    return {
+        "result": True,
+        "likes": [{"user_id": like.user_id, "name": like.name} for like in likes],
+        "next_cursor": next_cursor,
+    }
 
 
 async def get_user_info(
     session: AsyncSession,
-    user: User
+    user: UserProfile,
+    viewer_id: int | None = None,
 ) -> dict:
     """
-    Функция для получения полной информации о пользователе, и формирования
-    нужной структуры для отправки на фронтенд.
+    Функция для формирования информации о пользователе для отправки на фронтенд.
+    Количество подписчиков, подписок и твитов берется из счетчиков пользователя,
+    сами списки доступны постранично.
 
     :param session: Сессия для работы с бд.
-    :param user: Объект пользователя для которого будет собираться вся информация.
+    :param user: Пользователь для которого собирается информация.
+    :param viewer_id: ID пользователя, который смотрит профиль.
     :return dict: Возвращаем данные в виде словаря."""
-    user_full: User | None = await get_full_user_data(session, user)
-    if user_full is not None:
-        return {
-            "result": True,
-            "user": {
-                "id": user_full.id,
-                "name": user_full.name,
-                "followers": user_full.follower,
-                "following": user_full.followed,
-            },
-        }
+    is_followed: bool = False
+    if viewer_id is not None and viewer_id != user.id:
+        is_followed = await is_following(session, viewer_id, user.id)
 
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail={
-            "result": False,
-            "error_type": "Not Found",
-            "error_message": "User is not found.",
+    return {
+        "result": True,
+        "user": {
+            "id": user.id,
+            "name": user.name,
+            "followers_count": user.followers_count,
+            "following_count": user.following_count,
+            "tweets_count": user.tweets_count,
+            "is_followed": is_followed,
         },
-    )
+    }
+
+
+async def follows_constructor(
+    session: AsyncSession,
+    user_id: int,
+    get_page: Callable[..., Awaitable[Sequence[Row]]],
+    cursor: str | None = None,
+    limit: int = number_of_follows,
+) -> dict:
+    """
+    Формируем страницу со списком подписчиков или подписок пользователя.
+
+    :param session: Сессия для работы с бд.
+    :param user_id: ID пользователя.
+    :param get_page: Функция выборки страницы, get_followers или get_following.
+    :param cursor: Курсор из ответа на предыдущую страницу.
+    :param limit: Количество пользователей на странице.
+    :return dict: Возвращаем данные в виде словаря.
+    """
+    after: int | None = decode_cursor(cursor, 1)[0] if cursor else None
+    users: Sequence[Row] = await get_page(session, user_id, after, limit + 1)
+
+    next_cursor: str | None = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].id)
+
+    return {
+        "result": True,
+        "users": [{"id": user.id, "name": user.name} for user in users],
+        "next_cursor": next_cursor,
+    }
 
 
-async def add_image_in_db(session: AsyncSession, url: str | None) -> int:
+async def add_image_in_db(session: AsyncSession, url: str, temp_location: Path) -> int:
     """
-    Функция для сохранения имени картинки в бд.
+    Функция для сохранения пути картинки в бд. Загрузка становится еще одной
+    ссылкой на файл хранилища. Ссылка берется до того, как файл кладется
+    в хранилище, и под блокировкой пути, под которой очередь удаления проверяет
+    ссылки, поэтому удаление твита не может убрать файл этой загрузки.
 
     :param session: Сессия для работы с бд.
-    :param url: Имя картинки.
+    :param url: Путь картинки в хранилище.
+    :param temp_location: Временный файл загрузки.
     :return int: id сохраненной картинки.
     """
     img: Image = Image(url=url)
     session.add(img)
+    await lock_media(session, [url])
+    await add_media_reference(session, url)
+    await store_file(temp_location, url)
     await session.commit()
     return img.id
@@ -4,10 +4,14 @@ import asyncio
 from typing import AsyncGenerator
 
 import pytest_asyncio
-from httpx import AsyncClient
+from httpx import AsyncClient, Response
+from crud.counters import reconcile_user_counters
+import crud.utils
+import metrics.middleware
 from main import app
+from metrics import instrument_engine
 from models import Tweet, User
-from models.db_conf import Base, get_async_session
+from models.db_conf import Base, get_async_session, get_read_session
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -21,6 +25,7 @@ postgres_container.start()
 postgres_container.driver = "asyncpg"
 
 engine_test = create_async_engine(postgres_container.get_connection_url())
+instrument_engine(engine_test.sync_engine, "test")
 
 async_session_maker = async_sessionmaker(
     bind=engine_test,
@@ -38,6 +43,13 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 app.dependency_overrides[get_async_session] = override_get_async_session
+app.dependency_overrides[get_read_session] = override_get_async_session
+
+# Pictures are deleted after checking references in the test database.
+crud.utils.media_deletion_queue.session_maker = async_session_maker
+
+# Debug mode exposes the number of SQL statements of every response in headers.
+metrics.middleware.debug = True
 
 
 async def insert_objects_users(async_session: async_sessionmaker[AsyncSession]) -> None:
@@ -54,9 +66,13 @@ async def insert_objects_users(async_session: async_sessionmaker[AsyncSession])
             usr_maks.followed.append(usr_polina)
             usr_anna.followed.append(usr_alex)
 
-            tweet_1 = Tweet(tweet_data="Tweet content", tweet_media_ids=["image.png"])
+            tweet_1 = Tweet(
+                tweet_data="Tweet content", tweet_media_ids=["image.png"], likes_count=1
+            )
             tweet_2 = Tweet(
-                tweet_data="Tweet content another", tweet_media_ids=["image.png"]
+                tweet_data="Tweet content another",
+                tweet_media_ids=["image.png"],
+                likes_count=1,
             )
 
             usr_alex.tweets.append(tweet_1)
@@ -75,6 +91,10 @@ async def insert_objects_users(async_session: async_sessionmaker[AsyncSession])
             )
             await session.commit()
 
+    # The data is added via ORM, so the user counters are filled by reconciliation.
+    async with async_session() as session:
+        await reconcile_user_counters(session)
+
 
 @pytest_asyncio.fixture(autouse=True, scope="session")
 async def prepare_database():
@@ -97,7 +117,23 @@ def event_loop(request):
     loop.close()
 
 
+async def check_query_budget(response: Response) -> None:
+    """Fail the test when a route executed more SQL statements than it declares."""
+    budget = response.headers.get("X-Query-Budget")
+    if budget is None:
+        return
+    queries = int(response.headers["X-Query-Count"])
+    assert queries <= int(budget), "{0} {1} executed {2} SQL statements, budget {3}".format(
+        response.request.method, response.request.url.path, queries, budget
+    )
+
+
 @pytest_asyncio.fixture(scope="session")
 async def ac() -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    """The client checks the query budget of every endpoint called by the tests."""
+    async with AsyncClient(
+        app=app,
+        base_url="http://test",
+        event_hooks={"response": [check_query_budget]},
+    ) as ac:
         yield ac
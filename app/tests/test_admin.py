@@ -0,0 +1,74 @@
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from metrics import slow_query_log
+from tests.conftest import async_session_maker
+
+
+async def test_admin_endpoints_disabled_without_key(ac: AsyncClient, monkeypatch):
+    """Without ADMIN_API_KEY the service endpoints are not available."""
+    monkeypatch.setattr("routes.admin_route.ADMIN_API_KEY", None)
+    response = await ac.get("/api/admin/pool", headers={"admin-key": "secret"})
+    assert response.status_code == 404
+
+
+async def test_pool_status_wrong_key(ac: AsyncClient, monkeypatch):
+    """A wrong admin key is rejected."""
+    monkeypatch.setattr("routes.admin_route.ADMIN_API_KEY", "secret")
+    response = await ac.get("/api/admin/pool", headers={"admin-key": "test"})
+    assert response.status_code == 403
+
+
+async def test_pool_status(ac: AsyncClient, monkeypatch):
+    """The pool state of the worker is returned to the administrator."""
+    monkeypatch.setattr("routes.admin_route.ADMIN_API_KEY", "secret")
+    response = await ac.get("/api/admin/pool", headers={"admin-key": "secret"})
+    pool = response.json().get("pool")
+    assert response.status_code == 200
+    assert pool.get("size") == 5
+    assert not pool.get("pgbouncer")
+
+
+async def test_slow_queries_with_plans(ac: AsyncClient, monkeypatch):
+    """Statements over the threshold are logged with the route and the plan."""
+    monkeypatch.setattr("routes.admin_route.ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(slow_query_log, "threshold", 0.0)
+    monkeypatch.setattr(slow_query_log, "explain_interval", 0.0)
+    slow_query_log.clear()
+
+    await ac.get("/api/users/2", headers={"api-key": "test"})
+    await slow_query_log.join()
+    response = await ac.get("/api/admin/slow-queries", headers={"admin-key": "secret"})
+    queries = response.json().get("queries")
+    profile = [query for query in queries if query["route"] == "/api/users/{user_id}"]
+    assert response.status_code == 200
+    assert profile
+    assert all("actual time" in query["plan"] for query in profile)
+    assert all(set(query["parameters"]) == {"int"} for query in profile)
+
+    await ac.delete("/api/admin/slow-queries", headers={"admin-key": "secret"})
+    response = await ac.get("/api/admin/slow-queries", headers={"admin-key": "secret"})
+    assert response.json().get("queries") == []
+
+
+async def test_slow_advisory_lock_is_not_executed_again(monkeypatch):
+    """A slow SELECT that takes an advisory lock is explained without ANALYZE,
+    so capturing the plan does not wait for the lock held by the statement."""
+    monkeypatch.setattr(slow_query_log, "threshold", 0.0)
+    monkeypatch.setattr(slow_query_log, "explain_interval", 0.0)
+    monkeypatch.setattr(slow_query_log, "explain_timeout", 1.0)
+    slow_query_log.clear()
+
+    async with async_session_maker() as session:
+        await session.execute(select(func.pg_advisory_xact_lock(7_340_099)))
+        # The lock is still held by this transaction while the plan is captured.
+        await slow_query_log.join()
+        await session.commit()
+
+    locks = [
+        entry for entry in slow_query_log.entries()
+        if "pg_advisory_xact_lock" in entry["statement"]
+    ]
+    assert locks
+    assert all(entry["plan"] and "actual time" not in entry["plan"] for entry in locks)
+    slow_query_log.clear()
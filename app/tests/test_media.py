@@ -1,6 +1,18 @@
+import hashlib
+import uuid
 from pathlib import Path
+from typing import List
 
+import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy import select
+
+from crud.tweet import delete_tweet_by_id, get_tweet_by_id
+from crud.utils import OUT_PATH as media_out_path
+from crud.utils import media_deletion_queue, media_key, remove_images
+from models import Image, media_files
+from tests.conftest import async_session_maker
 
 OUT_PATH = Path(__file__).parent / "files_for_tests"
 OUT_PATH.mkdir(exist_ok=True, parents=True)
@@ -60,3 +72,154 @@ async def test_upload_unsupported_format(ac: AsyncClient):
     data = response.json()
     assert response.status_code == 415
     assert not data.get("result")
+
+
+async def test_upload_file_disguised_as_image(ac: AsyncClient):
+    """Test for saving a file that is declared as an image but is not one"""
+    response = await ac.post(
+        "/api/medias",
+        headers={"api-key": "test"},
+        files={
+            "file": (
+                "test_file_pdf.png",
+                open(f"{OUT_PATH}/test_file_pdf.txt", "rb"),
+                "image/png",
+            )
+        },
+    )
+    data = response.json()
+    assert response.status_code == 415
+    assert not data.get("result")
+
+
+async def test_images_are_deleted_in_background():
+    """Test for deleting pictures through the deletion queue"""
+    image = media_out_path / "image_for_deletion.png"
+    image.write_bytes(b"\x89PNG\r\n\x1a\n")
+
+    await remove_images([image.name, "image_that_does_not_exist.png"])
+    await media_deletion_queue.join()
+
+    assert not image.exists()
+    assert media_deletion_queue.queue_depth == 0
+    assert media_deletion_queue.failures == 0
+
+
+async def upload_png(ac: AsyncClient, content: bytes, times: int) -> List[int]:
+    """Upload the same PNG several times and return the media ids."""
+    media_ids = []
+    for _ in range(times):
+        response = await ac.post(
+            "/api/medias",
+            headers={"api-key": "test"},
+            files={"file": ("same.png", content, "image/png")},
+        )
+        assert response.status_code == 201
+        media_ids.append(response.json()["media_id"])
+    return media_ids
+
+
+async def test_identical_uploads_share_one_file(ac: AsyncClient):
+    """The same picture uploaded twice is stored once under its content hash."""
+    content = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+    media_ids = await upload_png(ac, content, 2)
+
+    key = media_key(hashlib.sha256(content).hexdigest(), ".png")
+    async with async_session_maker() as session:
+        urls = set(await session.scalars(select(Image.url).where(Image.id.in_(media_ids))))
+        refcount = await session.scalar(
+            select(media_files.c.refcount).where(media_files.c.key == key)
+        )
+    assert urls == {key}
+    assert refcount == 2
+    assert (media_out_path / key).is_file()
+
+
+async def test_image_is_removed_with_the_last_reference(ac: AsyncClient):
+    """Deleting a tweet keeps a shared picture until its last tweet is deleted."""
+    content = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+    key = media_key(hashlib.sha256(content).hexdigest(), ".png")
+    tweet_ids = []
+    for media_id in await upload_png(ac, content, 2):
+        response = await ac.post(
+            "/api/tweets",
+            headers={"api-key": "test"},
+            json={"tweet_data": "Tweet with a shared picture", "tweet_media_ids": [media_id]},
+        )
+        tweet_ids.append(response.json()["tweet_id"])
+
+    await ac.delete(f"/api/tweets/{tweet_ids[0]}", headers={"api-key": "test"})
+    await media_deletion_queue.join()
+    assert (media_out_path / key).is_file()
+
+    await ac.delete(f"/api/tweets/{tweet_ids[1]}", headers={"api-key": "test"})
+    await media_deletion_queue.join()
+    assert not (media_out_path / key).exists()
+
+
+async def test_upload_between_delete_and_unlink_keeps_the_file(ac: AsyncClient, monkeypatch):
+    """An upload of the same picture after its last tweet is deleted, but before the
+    queued file is removed, keeps the file: the queue re-checks references."""
+    content = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+    key = media_key(hashlib.sha256(content).hexdigest(), ".png")
+    media_ids = await upload_png(ac, content, 1)
+    response = await ac.post(
+        "/api/tweets",
+        headers={"api-key": "test"},
+        json={"tweet_data": "Tweet with a picture", "tweet_media_ids": media_ids},
+    )
+    tweet_id = response.json()["tweet_id"]
+
+    # The delete commits the released reference, the removal of the file is held back.
+    queued: List[str] = []
+
+    async def hold_images(images_list: List[str]) -> None:
+        queued.extend(images_list)
+
+    monkeypatch.setattr("crud.tweet.remove_images", hold_images)
+    await ac.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "test"})
+    assert queued == [key]
+
+    await upload_png(ac, content, 1)
+    await remove_images(queued)
+    await media_deletion_queue.join()
+
+    async with async_session_maker() as session:
+        refcount = await session.scalar(
+            select(media_files.c.refcount).where(media_files.c.key == key)
+        )
+    assert refcount == 1
+    assert (media_out_path / key).is_file()
+
+
+async def test_second_delete_of_a_tweet_keeps_shared_picture(ac: AsyncClient):
+    """A delete that lost the race to another delete of the same tweet does not
+    release its pictures a second time."""
+    content = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+    key = media_key(hashlib.sha256(content).hexdigest(), ".png")
+    tweet_ids = []
+    for media_id in await upload_png(ac, content, 2):
+        response = await ac.post(
+            "/api/tweets",
+            headers={"api-key": "test"},
+            json={"tweet_data": "Tweet with a shared picture", "tweet_media_ids": [media_id]},
+        )
+        tweet_ids.append(response.json()["tweet_id"])
+
+    # Both requests loaded the tweet before either of them deleted it.
+    async with async_session_maker() as session:
+        tweet = await get_tweet_by_id(session, tweet_ids[0])
+    async with async_session_maker() as session:
+        await delete_tweet_by_id(session, tweet)
+    async with async_session_maker() as session:
+        with pytest.raises(HTTPException):
+            await delete_tweet_by_id(session, tweet)
+    await media_deletion_queue.join()
+
+    async with async_session_maker() as session:
+        refcount = await session.scalar(
+            select(media_files.c.refcount).where(media_files.c.key == key)
+        )
+    assert refcount == 1
+    assert (media_out_path / key).is_file()
+    await ac.delete(f"/api/tweets/{tweet_ids[1]}", headers={"api-key": "test"})
@@ -0,0 +1,14 @@
+from httpx import AsyncClient
+
+
+async def test_metrics_exposition(ac: AsyncClient):
+    """Handled requests are exposed by the route template with their queries."""
+    await ac.get("/api/tweets", headers={"api-key": "test"})
+    await ac.get("/api/users/1", headers={"api-key": "test"})
+    response = await ac.get("/metrics")
+    body: str = response.text
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/tweets"' in body
+    assert 'route="/api/users/{user_id}"' in body
+    assert "db_queries_per_request_count" in body
+    assert "cache_requests_total" in body
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from metrics import metrics_middleware, query_budget
+from models import Tweet
+from tests.conftest import async_session_maker, override_get_async_session
+
+
+async def test_query_count_headers(ac: AsyncClient):
+    """In debug mode the response reports its SQL statements and the route budget."""
+    response = await ac.get("/api/users/me", headers={"api-key": "test"})
+    assert response.status_code == 200
+    assert response.headers["X-Query-Budget"] == "2"
+    assert int(response.headers["X-Query-Count"]) <= 2
+    assert float(response.headers["X-Query-Time"]) >= 0
+
+
+async def test_budget_exceeded_is_logged(caplog: pytest.LogCaptureFixture):
+    """A route that executes more statements than declared is reported."""
+    application = FastAPI()
+    application.middleware("http")(metrics_middleware)
+
+    @application.get("/over-budget", dependencies=[Depends(query_budget(1))])
+    async def over_budget(
+        session: AsyncSession = Depends(override_get_async_session),
+    ) -> dict:
+        await session.execute(text("SELECT 1"))
+        await session.execute(text("SELECT 2"))
+        return {"result": True}
+
+    with caplog.at_level(logging.WARNING, logger="metrics.middleware"):
+        async with AsyncClient(app=application, base_url="http://test") as client:
+            response = await client.get("/over-budget")
+
+    assert response.headers["X-Query-Count"] == "2"
+    assert "executed 2 SQL statements, the budget is 1" in caplog.text
+
+
+async def test_lazy_loading_is_disabled():
+    """Relationships are not loaded implicitly, so an N+1 fails loudly."""
+    async with async_session_maker() as session:
+        tweet = (await session.scalars(select(Tweet).limit(1))).one()
+        with pytest.raises(InvalidRequestError):
+            tweet.likes
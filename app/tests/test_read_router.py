@@ -0,0 +1,26 @@
+import time
+
+from models.db_conf import ReadRouter
+
+
+def test_replicas_are_used_in_turn_and_skipped_when_down():
+    """Replicas are chosen in turn, an unavailable replica is skipped."""
+    router = ReadRouter(2, sticky_window=5.0, retry_interval=30.0)
+    assert router.candidates() == [0, 1]
+    assert router.candidates() == [1, 0]
+
+    router.mark_down(1)
+    assert router.candidates() == [0]
+    assert router.candidates() == [0]
+
+
+def test_user_reads_from_primary_after_write():
+    """After a write the user is routed to the primary for the sticky window."""
+    router = ReadRouter(1, sticky_window=5.0, retry_interval=30.0)
+    assert not router.is_sticky("test")
+
+    primary_until = router.mark_write("test")
+    assert router.is_sticky("test")
+    assert not router.is_sticky("qwerty")
+    assert router.is_sticky("qwerty", str(primary_until))
+    assert not router.is_sticky("qwerty", str(time.time() - 1))
@@ -1,6 +1,12 @@
 """Module for testing work with tweets."""
+import pytest
 from httpx import AsyncClient
 
+from cache import feed_cache
+from cache.feed import FeedCache, MemoryBackend, create_backend
+from crud.pagination import encode_cursor
+from schemas.tweet_schema import ListTweetSchema
+
 
 async def test_get_all_tweets(ac: AsyncClient):
     """Tweet list extraction test."""
@@ -95,3 +101,202 @@ async def test_delete_like_twice(ac: AsyncClient):
     data = response.json()
     assert response.status_code == 404
     assert data.get("detail").get("error_message") == "No like found to delete it."
+
+
+async def test_tweets_sorted_by_likes(ac: AsyncClient):
+    """The feed is sorted by the number of likes, the newest tweet goes first on a tie."""
+    await ac.post("/api/tweets/1/likes", headers={"api-key": "test_2"})
+    response = await ac.get("/api/tweets", headers={"api-key": "test"})
+    tweets = response.json().get("tweets")
+    assert tweets[0].get("id") == 1
+    assert len(tweets[0].get("likes")) == 2
+    await ac.delete("/api/tweets/1/likes", headers={"api-key": "test_2"})
+
+
+async def test_get_tweets_by_pages(ac: AsyncClient):
+    """The feed is returned page by page, the cursor leads to the next page."""
+    response = await ac.get("/api/tweets?limit=1", headers={"api-key": "test"})
+    first_page = response.json()
+    assert len(first_page.get("tweets")) == 1
+    assert first_page.get("next_cursor")
+
+    response = await ac.get(
+        "/api/tweets",
+        params={"limit": 1, "cursor": first_page.get("next_cursor")},
+        headers={"api-key": "test"},
+    )
+    second_page = response.json()
+    assert len(second_page.get("tweets")) == 1
+    assert second_page.get("tweets")[0].get("id") != first_page.get("tweets")[0].get("id")
+    assert second_page.get("next_cursor") is None
+
+
+async def test_get_tweets_invalid_cursor(ac: AsyncClient):
+    """An invalid cursor is rejected."""
+    response = await ac.get("/api/tweets?cursor=broken", headers={"api-key": "test"})
+    assert response.status_code == 400
+
+
+async def test_get_tweets_out_of_range_cursor(ac: AsyncClient):
+    """A cursor with values outside the integer column range is rejected."""
+    for cursor in (encode_cursor(0, 2**31), encode_cursor(-1, 1)):
+        response = await ac.get(
+            "/api/tweets", params={"cursor": cursor}, headers={"api-key": "test"}
+        )
+        assert response.status_code == 400
+
+
+async def test_followers_feed_from_home_timeline(ac: AsyncClient, monkeypatch):
+    """In follower mode the feed is read from the home timeline,
+    which is filled on follow and tweet creation and cleared on unfollow."""
+    monkeypatch.setattr("crud.tweet.tweet_followers", True)
+    monkeypatch.setattr("crud.user.tweet_followers", True)
+    monkeypatch.setattr("service.tweet_followers", True)
+
+    await ac.post("/api/users/1/follow", headers={"api-key": "test_2"})
+    response = await ac.post(
+        "/api/tweets",
+        headers={"api-key": "test"},
+        json={"tweet_data": "Tweet for the followers", "tweet_media_ids": []},
+    )
+    new_tweet_id = response.json().get("tweet_id")
+
+    response = await ac.get("/api/tweets", headers={"api-key": "test_2"})
+    tweet_ids = {tweet.get("id") for tweet in response.json().get("tweets")}
+    assert tweet_ids == {1, new_tweet_id}
+
+    await ac.delete(f"/api/tweets/{new_tweet_id}", headers={"api-key": "test"})
+    await ac.delete("/api/users/1/follow", headers={"api-key": "test_2"})
+    response = await ac.get("/api/tweets", headers={"api-key": "test_2"})
+    assert response.json().get("tweets") == []
+
+
+async def test_followers_feed_newest_first(ac: AsyncClient, monkeypatch):
+    """The follower feed goes from new tweets to old ones, likes are read from tweets
+    and do not reorder it."""
+    monkeypatch.setattr("crud.tweet.tweet_followers", True)
+    monkeypatch.setattr("crud.user.tweet_followers", True)
+    monkeypatch.setattr("service.tweet_followers", True)
+
+    await ac.post("/api/users/1/follow", headers={"api-key": "test_2"})
+    response = await ac.post(
+        "/api/tweets",
+        headers={"api-key": "test"},
+        json={"tweet_data": "Newest tweet for the followers", "tweet_media_ids": []},
+    )
+    new_tweet_id = response.json().get("tweet_id")
+    await ac.post("/api/tweets/1/likes", headers={"api-key": "qwerty_2"})
+
+    response = await ac.get("/api/tweets?limit=1", headers={"api-key": "test_2"})
+    first_page = response.json()
+    assert [tweet.get("id") for tweet in first_page.get("tweets")] == [new_tweet_id]
+
+    response = await ac.get(
+        "/api/tweets",
+        params={"limit": 1, "cursor": first_page.get("next_cursor")},
+        headers={"api-key": "test_2"},
+    )
+    second_page = response.json()
+    liked = second_page.get("tweets")[0]
+    assert liked.get("id") == 1
+    assert {"user_id": 4, "name": "Anna"} in liked.get("likes")
+    assert second_page.get("next_cursor") is None
+
+    await ac.delete("/api/tweets/1/likes", headers={"api-key": "qwerty_2"})
+    await ac.delete(f"/api/tweets/{new_tweet_id}", headers={"api-key": "test"})
+    await ac.delete("/api/users/1/follow", headers={"api-key": "test_2"})
+
+
+async def test_feed_cache_invalidated_by_like(ac: AsyncClient):
+    """The feed is served from the cache until a like changes it."""
+    await ac.get("/api/tweets", headers={"api-key": "test"})
+    hits = feed_cache.hits
+    await ac.get("/api/tweets", headers={"api-key": "qwerty"})
+    assert feed_cache.hits == hits + 1
+
+    await ac.post("/api/tweets/2/likes", headers={"api-key": "test"})
+    response = await ac.get("/api/tweets", headers={"api-key": "test"})
+    tweet = next(t for t in response.json().get("tweets") if t.get("id") == 2)
+    assert {"user_id": 1, "name": "Alex"} in tweet.get("likes")
+    await ac.delete("/api/tweets/2/likes", headers={"api-key": "test"})
+
+
+def test_memory_feed_cache_refused_with_several_workers(monkeypatch):
+    """The process-local cache cannot be invalidated across gunicorn workers."""
+    monkeypatch.setattr("cache.feed.feed_cache_backend", "memory")
+    monkeypatch.setattr("cache.feed.web_concurrency", 4)
+    with pytest.raises(RuntimeError):
+        create_backend()
+
+    monkeypatch.setattr("cache.feed.feed_cache_backend", "off")
+    assert create_backend() is None
+
+
+async def test_replica_page_not_cached_after_write():
+    """A page read from a possibly lagging replica right after a write is not stored."""
+    cache = FeedCache(MemoryBackend(10), ttl=30, replica_window=5)
+    await cache.invalidate()
+    generation, _ = await cache.get("global", None, 10)
+
+    await cache.set(generation, "global", None, 10, b"stale", from_replica=True)
+    assert (await cache.get("global", None, 10))[1] is None
+
+    await cache.set(generation, "global", None, 10, b"fresh")
+    assert (await cache.get("global", None, 10))[1] == b"fresh"
+
+
+async def test_like_not_existing_tweet(ac: AsyncClient):
+    """Liking and unliking a tweet that does not exist returns 404."""
+    response = await ac.post("/api/tweets/100/likes", headers={"api-key": "test"})
+    assert response.status_code == 404
+    response = await ac.delete("/api/tweets/100/likes", headers={"api-key": "test"})
+    data = response.json()
+    assert response.status_code == 404
+    assert data.get("detail").get("error_message") == "Tweet with this id not found."
+
+
+async def test_feed_contains_like_summary(ac: AsyncClient):
+    """The feed returns the number of likes and the current user's like mark."""
+    await ac.post("/api/tweets/1/likes", headers={"api-key": "test_2"})
+    response = await ac.get("/api/tweets", headers={"api-key": "test_2"})
+    tweet = next(t for t in response.json().get("tweets") if t.get("id") == 1)
+    assert tweet.get("likes_count") == 2
+    assert tweet.get("liked_by_me")
+
+    response = await ac.get("/api/tweets", headers={"api-key": "test"})
+    tweet = next(t for t in response.json().get("tweets") if t.get("id") == 1)
+    assert not tweet.get("liked_by_me")
+    await ac.delete("/api/tweets/1/likes", headers={"api-key": "test_2"})
+
+
+async def test_get_tweet_likes_by_pages(ac: AsyncClient):
+    """The full list of users who liked a tweet is returned page by page."""
+    await ac.post("/api/tweets/1/likes", headers={"api-key": "test_2"})
+    response = await ac.get("/api/tweets/1/likes?limit=1", headers={"api-key": "test"})
+    first_page = response.json()
+    assert response.status_code == 200
+    assert first_page.get("likes") == [{"user_id": 2, "name": "Maks"}]
+
+    response = await ac.get(
+        "/api/tweets/1/likes",
+        params={"limit": 1, "cursor": first_page.get("next_cursor")},
+        headers={"api-key": "test"},
+    )
+    second_page = response.json()
+    assert second_page.get("likes") == [{"user_id": 3, "name": "Polina"}]
+    assert second_page.get("next_cursor") is None
+    await ac.delete("/api/tweets/1/likes", headers={"api-key": "test_2"})
+
+
+async def test_get_likes_of_not_existing_tweet(ac: AsyncClient):
+    """Requesting likes of a tweet that does not exist returns 404."""
+    response = await ac.get("/api/tweets/100/likes", headers={"api-key": "test"})
+    assert response.status_code == 404
+
+
+async def test_feed_matches_response_schema(ac: AsyncClient):
+    """The feed is serialized without validation, but still matches its schema."""
+    response = await ac.get("/api/tweets", headers={"api-key": "test"})
+    page = ListTweetSchema.model_validate(response.json())
+    assert page.tweets[0].author.name
+    assert response.headers["content-type"] == "application/json"
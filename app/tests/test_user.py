@@ -1,4 +1,15 @@
+import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from cache import UserIdentity, auth_cache
+from crud.counters import reconcile_user_counters
+from crud.tweet import delete_tweet_by_id, get_tweet_by_id
+from models import Tweet, User
+from schemas.user_schema import ReturnUserSchema
+from tests.conftest import async_session_maker
 
 
 async def test_get_user_me(ac: AsyncClient):
@@ -75,3 +86,118 @@ async def test_user_add_followed_not_exists_user(ac: AsyncClient):
     data = response.json()
     assert data.get("detail").get("error_message") == "User is not found."
     assert response.status_code == 404
+
+
+async def test_api_key_is_cached(ac: AsyncClient):
+    """Repeated requests with the same api_key are authenticated from the cache."""
+    await ac.get("/api/users/me", headers={"api-key": "test"})
+    hits = auth_cache.hits
+    response = await ac.get("/api/users/me", headers={"api-key": "test"})
+    assert response.status_code == 200
+    assert auth_cache.hits == hits + 1
+    assert auth_cache.get("test") == UserIdentity(id=1, name="Alex")
+
+
+async def test_user_profile_contains_follow_counts(ac: AsyncClient):
+    """The profile returns the number of followers and following."""
+    response = await ac.get("/api/users/1", headers={"api-key": "qwerty_2"})
+    user = response.json().get("user")
+    assert user.get("followers_count") == 1
+    assert user.get("following_count") == 1
+    assert user.get("is_followed")
+
+
+async def test_get_followers_by_pages(ac: AsyncClient):
+    """Followers of the user are returned page by page."""
+    await ac.post("/api/users/1/follow", headers={"api-key": "test_2"})
+    response = await ac.get("/api/users/1/followers?limit=1", headers={"api-key": "test"})
+    first_page = response.json()
+    assert response.status_code == 200
+    assert first_page.get("users") == [{"id": 3, "name": "Polina"}]
+
+    response = await ac.get(
+        "/api/users/1/followers",
+        params={"limit": 1, "cursor": first_page.get("next_cursor")},
+        headers={"api-key": "test"},
+    )
+    second_page = response.json()
+    assert second_page.get("users") == [{"id": 4, "name": "Anna"}]
+    assert second_page.get("next_cursor") is None
+    await ac.delete("/api/users/1/follow", headers={"api-key": "test_2"})
+
+
+async def test_get_following(ac: AsyncClient):
+    """The list of users the user is following."""
+    response = await ac.get("/api/users/1/following", headers={"api-key": "test"})
+    assert response.status_code == 200
+    assert response.json().get("users") == [{"id": 2, "name": "Maks"}]
+
+
+async def test_get_followers_not_exists_user(ac: AsyncClient):
+    """Requesting followers of a user who is not in the database returns 404."""
+    response = await ac.get("/api/users/100/followers", headers={"api-key": "test"})
+    assert response.status_code == 404
+
+
+async def test_follow_counters_are_updated(ac: AsyncClient):
+    """Following and unfollowing changes the counters of both users."""
+    await ac.post("/api/users/3/follow", headers={"api-key": "test"})
+    me = (await ac.get("/api/users/me", headers={"api-key": "test"})).json()["user"]
+    polina = (await ac.get("/api/users/3", headers={"api-key": "test"})).json()["user"]
+    assert me.get("following_count") == 2
+    assert polina.get("followers_count") == 2
+
+    await ac.delete("/api/users/3/follow", headers={"api-key": "test"})
+    me = (await ac.get("/api/users/me", headers={"api-key": "test"})).json()["user"]
+    assert me.get("following_count") == 1
+
+
+async def test_reconcile_user_counters():
+    """Reconciliation fixes the counters that drifted from the actual rows."""
+    async with async_session_maker() as session:
+        tweets_count = await session.scalar(
+            select(func.count()).select_from(Tweet).where(Tweet.user_id == 1)
+        )
+        await session.execute(update(User).where(User.id == 1).values(tweets_count=-1))
+        await session.commit()
+        assert await reconcile_user_counters(session) == 1
+        user = await session.get(User, 1, populate_existing=True)
+        assert user.tweets_count == tweets_count
+
+
+async def test_tweets_count_decremented_once_on_double_delete(ac: AsyncClient):
+    """A delete that finds the tweet already deleted leaves the author's counter alone."""
+    response = await ac.post(
+        "/api/tweets",
+        headers={"api-key": "test"},
+        json={"tweet_data": "Tweet deleted twice", "tweet_media_ids": []},
+    )
+    tweet_id = response.json()["tweet_id"]
+    me = (await ac.get("/api/users/me", headers={"api-key": "test"})).json()["user"]
+
+    # Both requests loaded the tweet before either of them deleted it.
+    async with async_session_maker() as session:
+        tweet = await get_tweet_by_id(session, tweet_id)
+    async with async_session_maker() as session:
+        await delete_tweet_by_id(session, tweet)
+    async with async_session_maker() as session:
+        with pytest.raises(HTTPException):
+            await delete_tweet_by_id(session, tweet)
+
+    after = (await ac.get("/api/users/me", headers={"api-key": "test"})).json()["user"]
+    assert after.get("tweets_count") == me.get("tweets_count") - 1
+
+
+async def test_profile_matches_response_schema(ac: AsyncClient):
+    """The profile is serialized without validation, but still matches its schema."""
+    response = await ac.get("/api/users/2", headers={"api-key": "test"})
+    profile = ReturnUserSchema.model_validate(response.json())
+    assert profile.user.name == "Maks"
+
+
+async def test_api_key_stays_unique():
+    """The covering index on api_key still rejects a duplicate key."""
+    async with async_session_maker() as session:
+        session.add(User(name="Copy", api_key="test"))
+        with pytest.raises(IntegrityError):
+            await session.commit()
@@ -0,0 +1,60 @@
+"""Warm-up of a worker before it starts accepting requests."""
+import asyncio
+import logging
+from contextlib import suppress
+
+from config import db_settings, number_of_tweets, warmup_timeout
+from crud.user import get_user_by_api_key, get_user_profile
+from fastapi import HTTPException
+from models.db_conf import async_session_maker, engine
+from service import get_feed
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+
+async def open_pool(connections: int) -> None:
+    """
+    Открываем соединения пула заранее, чтобы первые запросы не ждали подключения к бд.
+
+    :param connections: Сколько соединений открыть.
+    :return None: Ничего не возвращаем.
+    """
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(select(1))
+
+    # Соединения берутся из пула одновременно, поэтому открываются разные соединения.
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def prime_hot_paths() -> None:
+    """
+    Выполняем запросы горячих эндпоинтов по одному разу. SQLAlchemy кэширует
+    компиляцию выражений, asyncpg - подготовленные выражения на соединении,
+    а первая страница общей ленты попадает в кэш ленты.
+
+    :return None: Ничего не возвращаем.
+    """
+    async with async_session_maker() as session:
+        await get_feed(session, 0, None, number_of_tweets)
+        # Несуществующие пользователи: нужна только компиляция запросов.
+        with suppress(HTTPException):
+            await get_user_by_api_key(session, "")
+        with suppress(HTTPException):
+            await get_user_profile(session, 0)
+
+
+async def warm_up() -> None:
+    """
+    Прогрев воркера при запуске. Ошибки и превышение warmup_timeout только
+    логируются, воркер все равно начинает принимать запросы.
+
+    :return None: Ничего не возвращаем.
+    """
+    try:
+        await asyncio.wait_for(open_pool(db_settings.pool_size), warmup_timeout)
+        await asyncio.wait_for(prime_hot_paths(), warmup_timeout)
+    except Exception:
+        logger.exception("Worker warm-up failed")